@@ -0,0 +1,228 @@
+"""
+End-to-end benchmark over a synthetic corpus.
+
+    python -m src.benchmarks.run --cells 20 --samples 5000 --channels 4
+    python -m src.benchmarks.run --save-baseline           # store this run as the baseline
+    python -m src.benchmarks.run --baseline results/benchmarks/baseline.json
+
+Every stage records wall and CPU seconds, item throughput and the process peak RSS after
+the stage; results are written as JSON and compared against a stored baseline.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import subprocess
+import tempfile
+import numpy as np
+
+from glob import glob
+from pathlib import Path
+from contextlib import contextmanager
+
+from src.config import config
+
+IMPORT_BUDGET_S = 3.0
+DEFAULT_BASELINE = f'{config.RESULTS_DIR}/benchmarks/baseline.json'
+# batch sizes (rows) and calls per size of the small-batch inference latency check
+LATENCY_BATCHES = (1, 16, 256)
+LATENCY_REPEATS = 20
+
+def peak_rss_mb():
+    scale = 1 if sys.platform == 'darwin' else 1024  # ru_maxrss is bytes on macOS, KB on Linux
+    self_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    child_peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return max(self_peak, child_peak) / 2 ** 20
+
+class Benchmark:
+    def __init__(self):
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        """Time the body; it may set record['items'] (and record['bytes']) for throughput."""
+        record = {'stage': name}
+        wall, cpu = time.perf_counter(), time.process_time()
+        yield record
+        record['seconds'] = time.perf_counter() - wall
+        record['cpu_seconds'] = time.process_time() - cpu
+        record['peak_rss_mb'] = peak_rss_mb()
+        if record.get('items'):
+            record['items_per_s'] = record['items'] / record['seconds']
+        if record.get('bytes'):
+            record['mb_per_s'] = record['bytes'] / 2 ** 20 / record['seconds']
+        self.stages.append(record)
+        print(f"{name:>16}: {record['seconds']:8.3f}s  {record.get('items_per_s', 0):12.1f} items/s  {record['peak_rss_mb']:8.1f} MB")
+
+def import_time():
+    """Cold import of the library in a fresh interpreter, and whether it dragged in tensorflow."""
+    code = (
+        'import sys, time; t = time.perf_counter(); '
+        'import src.runner, src.preprocessing, src.plotting, src.classifiers.classical, src.classifiers.ensemble; '
+        'print(time.perf_counter() - t); print("tensorflow" in sys.modules)'
+    )
+    out = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                         cwd=Path(__file__).resolve().parents[2]).stdout.split()
+    return float(out[0]), out[1] == 'True'
+
+def batch_latency(models, features, batches=LATENCY_BATCHES, repeats=LATENCY_REPEATS):
+    """Milliseconds per predict_proba call of every model, for each batch size (rows)."""
+    latency = {}
+    for n in batches:
+        X = features[:n]
+        for name, model in models.items():
+            model.predict_proba(X)  # warm up
+            start = time.perf_counter()
+            for _ in range(repeats):
+                model.predict_proba(X)
+            latency[f'{name}_{len(X)}'] = (time.perf_counter() - start) / repeats * 1000
+    return latency
+
+def run(args):
+    import src.preprocessing  # registers the preprocessors with PREPROCESSORS
+    from src.benchmarks.synthetic import generate
+    from src.builders import PREPROCESSORS
+    from src.data.battery_data import BatteryData
+    from src.data.windowing import window_cells, classical_features
+
+    bench = Benchmark()
+    workdir = Path(args.workdir or tempfile.mkdtemp(prefix='tr-bench-'))
+    processed_dir = workdir / 'preprocessed'
+    ornl_dir, healthy_dir = generate(workdir, args.cells, args.samples, args.channels, args.healthy, args.seed)
+
+    with bench.stage('import') as r:
+        r['import_seconds'], r['tensorflow_loaded'] = import_time()
+        r['within_budget'] = r['import_seconds'] <= IMPORT_BUDGET_S and not r['tensorflow_loaded']
+
+    ornl = PREPROCESSORS.build({'name': 'ORNLPreprocessor', 'output_dir': str(processed_dir)})
+    calce = PREPROCESSORS.build({'name': 'CALCEPreprocessor', 'output_dir': str(processed_dir)})
+
+    with bench.stage('raw_parse') as r:
+        files = sorted(ornl_dir.glob('*.xlsx')) + sorted(healthy_dir.glob('*.csv'))
+        for f in files:
+            proc = ornl if f.suffix == '.xlsx' else calce
+            proc.get_timeseries_data(inputdir=f.parent, cell=f.stem)
+        r['items'] = len(files)
+        r['bytes'] = sum(f.stat().st_size for f in files)
+
+    with bench.stage('preprocess') as r:
+        processed = ornl.process(parentdir=str(ornl_dir))[0] + calce.process(parentdir=str(healthy_dir))[0]
+        r['items'] = processed
+
+    with bench.stage('serialization') as r:
+        pkls = sorted(glob(str(processed_dir / '*.pkl')))
+        roundtrip_dir = workdir / 'roundtrip'
+        os.makedirs(roundtrip_dir, exist_ok=True)
+        cells = []
+        for path in pkls:
+            cell = BatteryData.load(path)
+            cell.dump(roundtrip_dir / Path(path).name)
+            cells.append(cell)
+        r['items'] = len(cells)
+        r['bytes'] = 2 * sum(os.path.getsize(p) for p in pkls)
+
+    with bench.stage('windowing') as r:
+        windows = window_cells(cells, stride=args.stride)
+        features = classical_features(windows.X)
+        features = (features - features.mean(axis=0)) / (features.std(axis=0) + 1e-8)
+        r['items'] = len(windows)
+
+    from src.classifiers.classical import get_best
+
+    with bench.stage('grid_search') as r:
+        rng = np.random.default_rng(args.seed)
+        idx = rng.choice(len(windows), size=min(args.max_windows, len(windows)), replace=False)
+        best_params, best_est = get_best(args.model, features[idx], windows.y[idx], groups=windows.groups[idx], n_splits=3)
+        r['items'] = len(idx)
+        r['best_params'] = best_params
+
+    with bench.stage('inference') as r:
+        y_prob = best_est.predict_proba(features)[:, 1]
+        r['items'] = len(features)
+
+    if args.model in ('RandomForest', 'GB'):
+        from src.classifiers.tree_export import export_tree_ensemble
+        flat = export_tree_ensemble(best_est)
+        with bench.stage('inference_flat') as r:
+            flat_prob = flat.predict_proba(features)[:, 1]
+            r['items'] = len(features)
+            r['bit_identical'] = bool(np.array_equal(flat_prob, y_prob))
+        with bench.stage('inference_latency') as r:
+            r['batch_ms'] = batch_latency({'sklearn': best_est, 'flat': flat}, features)
+            r['items'] = sum(min(n, len(features)) for n in LATENCY_BATCHES) * LATENCY_REPEATS * 2
+
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    from src.metrics import label_confusion_matrix
+    from src.plotting import save_all_roc_curves, save_all_pr_curves, save_all_confusion_matrices
+
+    with bench.stage('plotting') as r:
+        plot_dir = workdir / 'plots'
+        os.makedirs(plot_dir, exist_ok=True)
+        roc_data = {args.model: (windows.y, y_prob)}
+        save_all_roc_curves(roc_data, dir=plot_dir)
+        save_all_pr_curves(roc_data, dir=plot_dir)
+        save_all_confusion_matrices({args.model: label_confusion_matrix(windows.y, y_prob > 0.5)}, dir=plot_dir)
+        r['items'] = len(y_prob)
+
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'cells': args.cells, 'samples': args.samples, 'channels': args.channels,
+            'healthy': args.healthy if args.healthy is not None else args.cells,
+            'stride': args.stride, 'model': args.model, 'max_windows': args.max_windows,
+            'workdir': str(workdir),
+        },
+        'stages': bench.stages,
+    }
+
+def compare(results, baseline, tolerance=0.2):
+    """Per-stage time ratio against the baseline; ratios above 1 + tolerance are flagged."""
+    base = {s['stage']: s for s in baseline['stages']}
+    comparison = {}
+    for s in results['stages']:
+        if s['stage'] in base and base[s['stage']]['seconds'] > 0:
+            ratio = s['seconds'] / base[s['stage']]['seconds']
+            comparison[s['stage']] = {'ratio': ratio, 'regression': ratio > 1 + tolerance}
+    return comparison
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='End-to-end thermal runaway pipeline benchmark')
+    parser.add_argument('--cells', type=int, default=10, help='runaway cells to generate')
+    parser.add_argument('--healthy', type=int, default=None, help='healthy cells to generate (default: --cells)')
+    parser.add_argument('--samples', type=int, default=5000, help='samples per cell')
+    parser.add_argument('--channels', type=int, default=1, choices=[1, 4, 6], help='thermocouples per runaway cell')
+    parser.add_argument('--stride', type=int, default=config.STRIDE)
+    parser.add_argument('--model', default='RandomForest')
+    parser.add_argument('--max-windows', type=int, default=5000, help='windows used for the grid search')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', default=None, help='where the synthetic corpus goes (default: a temp dir)')
+    parser.add_argument('--out', default=None)
+    parser.add_argument('--baseline', default=None, help='baseline JSON to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help=f'also write the results to {DEFAULT_BASELINE}')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    baseline = args.baseline or (DEFAULT_BASELINE if os.path.exists(DEFAULT_BASELINE) and not args.save_baseline else None)
+    if baseline:
+        with open(baseline) as f:
+            results['comparison'] = compare(results, json.load(f), args.tolerance)
+        for stage, c in results['comparison'].items():
+            print(f"{stage:>16}: {c['ratio']:.2f}x baseline{'  REGRESSION' if c['regression'] else ''}")
+
+    out = args.out or f"{config.RESULTS_DIR}/benchmarks/benchmark_{time.strftime('%Y%m%d-%H%M%S')}.json"
+    targets = [out] + ([DEFAULT_BASELINE] if args.save_baseline else [])
+    for target in targets:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'w') as f:
+            json.dump(results, f, indent=2, default=str)
+    print(f'Results written to {out}')
+
+if __name__ == '__main__':
+    main()
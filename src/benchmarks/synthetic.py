@@ -0,0 +1,81 @@
+import os
+import numpy as np
+import pandas as pd
+
+from pathlib import Path
+
+# column layouts understood by ORNLPreprocessor.get_timeseries_data
+SNL_TC_COLUMNS = ['TC1 near positive terminal [C]', 'TC2 near negative terminal [C]', 'TC3 bottom - bottom [C]',
+                  'TC4 bottom - top [C]', 'TC5 above punch [C]', 'TC6 below punch [C]']
+TCN_TC_COLUMNS = ['TC1 (°C)', 'TC2 (°C)', 'TC3 (°C)', 'TC4 (°C)']
+CHANNEL_LAYOUTS = {1: 'generic', 4: 'tcn', 6: 'snl'}
+
+def runaway_profile(rng, n_samples, dt=0.1, ambient=25.):
+    """Ambient noise, a slow pre-runaway ramp, an exponential spike to several hundred C and a cool-down."""
+    t = np.arange(n_samples) * dt
+    onset = rng.uniform(0.4, 0.7) * t[-1]
+    peak = rng.uniform(400, 800)
+    ramp = np.clip((t - 0.8 * onset) / (0.2 * onset), 0, 1) * rng.uniform(5, 20)
+    spike = np.where(t >= onset, peak * (1 - np.exp(-(t - onset) / 2.)) * np.exp(-(t - onset) / 60.), 0)
+    return t, ambient + ramp + spike + rng.normal(0, 0.3, n_samples)
+
+def healthy_profile(rng, n_samples, dt=10., ambient=25.):
+    """Cycling cell: temperature oscillating a few degrees with each charge/discharge."""
+    t = np.arange(n_samples) * dt
+    period = rng.uniform(3000, 8000)
+    return t, ambient + rng.uniform(2, 8) * (1 + np.sin(2 * np.pi * t / period)) / 2 + rng.normal(0, 0.1, n_samples)
+
+def write_ornl_cells(outdir, n_cells, n_samples, channels=1, seed=0):
+    """Write n_cells ORNL-style xlsx files; channels selects the generic, TCN (4) or SNL (6) layout."""
+    assert channels in CHANNEL_LAYOUTS, f'channels must be one of {list(CHANNEL_LAYOUTS)}'
+    layout = CHANNEL_LAYOUTS[channels]
+    rng = np.random.default_rng(seed)
+    os.makedirs(outdir, exist_ok=True)
+    paths = []
+    for i in range(n_cells):
+        soc = int(rng.choice([0, 20, 40, 60, 80, 100]))
+        time, temp = runaway_profile(rng, n_samples)
+        if layout == 'generic':
+            name = f'SYN-LCO-4000mAh-{soc}SOC-cell{i}'
+            df = pd.DataFrame({'reltime': time, 'Temperature [C]': temp})
+        elif layout == 'tcn':
+            name = f'SYN-NMC-10000mAh-{soc}SOC-cell{i}'
+            df = pd.DataFrame({'Time (sec) ': time, **{
+                col: temp + rng.normal(0, 5, n_samples) * (temp > 100) for col in TCN_TC_COLUMNS
+            }})
+        else:
+            name = f'SNL_LFP_Graphite_10Ah_{soc}SOC_syn{i}'
+            df = pd.DataFrame({'Test Time [s]': time, **{
+                col: temp + rng.normal(0, 5, n_samples) * (temp > 100) for col in SNL_TC_COLUMNS
+            }})
+        path = Path(outdir) / f'{name}.xlsx'
+        df.to_excel(path, index=False)
+        paths.append(path)
+    return paths
+
+def write_healthy_cells(outdir, n_cells, n_samples, seed=0):
+    """Write n_cells healthy-archive style timeseries CSVs."""
+    rng = np.random.default_rng(seed + 1)
+    os.makedirs(outdir, exist_ok=True)
+    paths = []
+    for i in range(n_cells):
+        time, temp = healthy_profile(rng, n_samples)
+        path = Path(outdir) / f'SYN_{i}_pouch_LCO_25C_0-100_timeseries.csv'
+        pd.DataFrame({
+            'Test_Time (s)': time,
+            'Cell_Temperature (C)': temp,
+            'Voltage (V)': 3.7 + 0.5 * np.sin(time / 1000.),
+        }).to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+def generate(root, n_cells=10, n_samples=5000, channels=1, n_healthy=None, seed=0):
+    """
+    Write a synthetic corpus under root/raw/ laid out like the real one and return the
+    (ornl_dir, healthy_dir) it was written to.
+    """
+    ornl_dir = Path(root) / 'raw' / 'oakridge' / 'excel'
+    healthy_dir = Path(root) / 'raw' / 'healthy_archive_data' / 'calce'
+    write_ornl_cells(ornl_dir, n_cells, n_samples, channels, seed)
+    write_healthy_cells(healthy_dir, n_cells if n_healthy is None else n_healthy, n_samples, seed)
+    return ornl_dir, healthy_dir
@@ -1,21 +1,26 @@
 import pandas as pd
 from src.config import config
 from src.classifiers.keras import MyKerasClassifier
+from src.classifiers.validation import grouped_search
+from src.metrics import METRICS, BinaryMetrics, label_confusion_matrix
+from src.bootstrap import bootstrap_metrics, add_intervals
+from src.utils.profiler import PROFILER
 
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier, VotingClassifier, StackingClassifier
 from sklearn.svm import SVC
 from sklearn.model_selection import GridSearchCV
-from sklearn.metrics import confusion_matrix, classification_report, roc_auc_score, roc_curve, auc
+from sklearn.metrics import classification_report
 
 import warnings
 warnings.filterwarnings(action="ignore", category=UserWarning)
 
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import LSTM, Dense, Dropout, Conv1D, MaxPooling1D, Flatten, Input
-from tensorflow.keras.optimizers import Adam
-
 #Deep Learning Models
+# tensorflow is imported inside the builders so classical-only runs never load it
 def build_lstm(units=64, learning_rate=0.001, features=2):
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import LSTM, Dense, Dropout, Input
+    from tensorflow.keras.optimizers import Adam
+
     model = Sequential([
         Input(shape=(config.WINDOW_SIZE, features)),
         LSTM(units),
@@ -26,6 +31,10 @@ def build_lstm(units=64, learning_rate=0.001, features=2):
     return model
 
 def build_cnn(filters=32, kernel_size=3, learning_rate=0.001, features=2):
+    from tensorflow.keras.models import Sequential
+    from tensorflow.keras.layers import Dense, Conv1D, MaxPooling1D, Flatten, Input
+    from tensorflow.keras.optimizers import Adam
+
     model = Sequential([
         Input(shape=(config.WINDOW_SIZE, features)),
         Conv1D(filters, kernel_size, activation='relu'),
@@ -71,21 +80,47 @@ def model_defs(name):
             "batch_size": [32]
         })
 
-def get_best(name, X, y):
-    (model, grid) = model_defs(name)
-    gs = GridSearchCV(model, grid, cv=3, scoring="roc_auc", n_jobs=-1)
-    gs.fit(X, y)
+def get_best(name, X, y, groups=None, n_splits=None, grid=None, distributed=None):
+    """
+    Without groups this is a plain 3-fold GridSearchCV. With groups (e.g. WindowedData.groups)
+    folds never split a cell: leave-one-group-out, or n_splits stratified group folds.
+    grid replaces the default grid from model_defs.
+    distributed (dict): with groups, run the search sharded over worker processes or nodes,
+    the dict holds keyword arguments of src.classifiers.distributed.distributed_search.
+
+    Profiling: grouped searches record a cv_fit stage per (candidate, fold) fit, from their
+    joblib and local distributed workers too; workers on other nodes only when started with
+    --profile. GridSearchCV fits are not traced one by one, their count and total fit time
+    are recorded on the get_best stage instead.
+    """
+    (model, default_grid) = model_defs(name)
+    grid = grid or default_grid
+    with PROFILER.stage('get_best', model=name, grouped=groups is not None) as rec:
+        if groups is not None and distributed is not None:
+            from src.classifiers.distributed import distributed_search
+            gs = distributed_search(model, grid, X, y, groups, n_splits=n_splits, **distributed)
+        elif groups is not None:
+            gs = grouped_search(model, grid, X, y, groups, n_splits=n_splits, n_jobs=-1)
+        else:
+            gs = GridSearchCV(model, grid, cv=3, scoring="roc_auc", n_jobs=-1)
+            gs.fit(X, y)
+            rec['fits'] = len(gs.cv_results_['params']) * gs.n_splits_
+            rec['fit_s'] = float(sum(gs.cv_results_['mean_fit_time'])) * gs.n_splits_
+        rec['items'] = len(y)
     return gs.best_params_, gs.best_estimator_
 
-def classify(name, train, test, confusion_matrices={}, roc_curves={}, train_auc={}, test_auc={}, best_params_all={}):
+def classify(name, train, test, confusion_matrices={}, roc_curves={}, train_auc={}, test_auc={}, best_params_all={}, auc_ci={}, grid=None, n_splits=None, distributed=None):
     """
     Parameters:
     - name (String)
+    - n_splits (int): grouped CV folds, None for leave-one-group-out (see get_best)
+    - distributed (dict): see get_best
     """
     is_classic = (name in CLASSICAL_MODELS)
     (train_X, test_X) = (train.X_scaled, test.X_scaled) if is_classic else (train.X, test.X)
 
-    best_params, best_est = get_best(name, train_X, train.y)
+    best_params, best_est = get_best(name, train_X, train.y, groups=getattr(train, 'groups', None), grid=grid,
+                                  n_splits=n_splits, distributed=distributed)
     print(f"🔍 Best {name} params:", best_params)
     best_params_all[name] = best_params
 
@@ -93,16 +128,26 @@ def classify(name, train, test, confusion_matrices={}, roc_curves={}, train_auc=
         prob = best_est.predict_proba(X)
         return prob[:,1] if is_classic else prob
 
-    y_pred = best_est.predict(test_X)
-    y_prob = get_y_prob(test_X)
+    with PROFILER.stage('predict', model=name) as rec:
+        y_pred = best_est.predict(test_X)
+        y_prob = get_y_prob(test_X)
+        rec['items'] = len(test_X)
 
-    confusion_matrices[name] = confusion_matrix(test.y, y_pred)
+    confusion_matrices[name] = label_confusion_matrix(test.y, y_pred)
     roc_curves[name] = (test.y, y_prob)
-    train_auc[name] = roc_auc_score(train.y, get_y_prob(train_X))
-    test_auc[name] = roc_auc_score(test.y, y_prob)
+    train_prob = get_y_prob(train_X)
+    train_auc[name] = BinaryMetrics(train.y, train_prob).auc
+    test_auc[name] = METRICS.get(name, test.y, y_prob).auc
+
+    train_ci = bootstrap_metrics(train.y, train_prob, groups=getattr(train, 'groups', None))
+    test_ci = bootstrap_metrics(test.y, y_prob, y_pred, groups=getattr(test, 'groups', None))
+    auc_ci[name] = (train_ci['auc'], test_ci['auc'])
 
     df = pd.DataFrame(classification_report(test.y, y_pred, output_dict=True)).transpose()
     df['model'] = name
+    df['train_auc'], df['test_auc'] = train_auc[name], test_auc[name]
+    add_intervals(df, {'auc': train_ci['auc']}, prefix='train_')
+    add_intervals(df, test_ci, prefix='test_')
     return df 
 
 
@@ -0,0 +1,360 @@
+"""
+Sharded grid search over a shared-filesystem task queue.
+
+The (candidate, fold) fits of a grouped search are split into shards and written to a job
+directory. Workers on any machine that sees the directory claim shards by renaming them,
+read X from the shared FeatureStore as a memmap, and write back out-of-fold predictions.
+The coordinator merges them into the same result as grouped_search.
+
+Workers crash-safely hand work back: a claimed shard whose worker died, or whose heartbeat
+is older than stale_after seconds, is put back in the queue. Rerunning an interrupted
+search with the same inputs reuses every shard already finished.
+
+    # on every worker node (--profile /shared/traces/<node>.jsonl to trace every fit)
+    python -m src.classifiers.distributed worker /shared/queue
+
+    # on the coordinator (n_workers=0: no local workers)
+    distributed_search(model, grid, X, y, groups, queue_dir='/shared/queue', n_workers=0,
+                       store=FeatureStore('/shared/features'))
+"""
+import os
+import sys
+import json
+import time
+import pickle
+import socket
+import hashlib
+import argparse
+import threading
+import traceback
+import multiprocessing
+import numpy as np
+
+from pathlib import Path
+from sklearn.base import clone
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import ParameterGrid
+
+from src.config import config
+from src.data.feature_store import FeatureStore
+from src.classifiers.validation import GroupedSearchResult, group_folds, _fit_and_predict, _pooled_score
+from src.utils.profiler import PROFILER
+
+def worker_id(pid=None):
+    return f'{socket.gethostname()}-{pid or os.getpid()}'
+
+def _is_dead(worker):
+    """True for a worker of this machine whose process no longer exists."""
+    host, _, pid = worker.rpartition('-')
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+def _atomic_pickle(obj, path):
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    with open(tmp, 'wb') as fout:
+        pickle.dump(obj, fout)
+    os.replace(tmp, path)
+
+class FileQueue:
+    """
+    One search job on a shared filesystem:
+
+        job.pkl          model, candidates, folds, labels and the FeatureStore key of X
+        tasks/<n>.pkl    shards waiting for a worker, a list of (candidate, fold) pairs
+        claimed/<n>@<w>  shards being worked on by worker w, mtime is its heartbeat
+        results/<n>.pkl  finished shards, a list of (candidate, fold, predictions)
+        results/<n>.err  shards whose fit raised, with the worker and traceback
+
+    Claiming is a rename, which is atomic, so a shard goes to exactly one worker.
+    """
+    def __init__(self, job_dir):
+        self.dir = Path(job_dir)
+        self.tasks = self.dir / 'tasks'
+        self.claimed = self.dir / 'claimed'
+        self.results = self.dir / 'results'
+
+    @property
+    def spec_path(self):
+        return self.dir / 'job.pkl'
+
+    def create(self, spec, shards):
+        """
+        Write the job, queueing only shards that are not finished or claimed already. The
+        sharding of an existing job is kept, so results done under it stay valid whatever
+        shards a restarted coordinator would pick. Returns the job's shards.
+        """
+        for d in (self.tasks, self.claimed, self.results):
+            os.makedirs(d, exist_ok=True)
+        if self.spec_path.exists():
+            shards = self.load_spec()['shards']
+        else:
+            _atomic_pickle({**spec, 'shards': shards}, self.spec_path)
+        # failed shards are retried when the job is started again
+        for path in self.results.glob('*.err'):
+            path.unlink(missing_ok=True)
+        busy = {p.name.split('@')[0] for p in self.claimed.iterdir()}
+        for i, shard in enumerate(shards):
+            name = f'{i:06d}'
+            if name not in busy and not (self.results / f'{name}.pkl').exists() \
+                    and not (self.tasks / f'{name}.pkl').exists():
+                _atomic_pickle(shard, self.tasks / f'{name}.pkl')
+        return shards
+
+    def load_spec(self):
+        with open(self.spec_path, 'rb') as fin:
+            return pickle.load(fin)
+
+    def claim(self, worker):
+        """(name, shard, claim path) of the next free shard, or None."""
+        for path in sorted(self.tasks.glob('*.pkl')):
+            claim = self.claimed / f'{path.stem}@{worker}'
+            try:
+                os.rename(path, claim)
+            except FileNotFoundError:
+                continue  # taken by another worker
+            with open(claim, 'rb') as fin:
+                return path.stem, pickle.load(fin), claim
+        return None
+
+    def complete(self, name, preds, claim):
+        _atomic_pickle(preds, self.results / f'{name}.pkl')
+        claim.unlink(missing_ok=True)
+
+    def fail(self, name, error, claim):
+        _atomic_pickle(error, self.results / f'{name}.err')
+        claim.unlink(missing_ok=True)
+
+    def errors(self):
+        """{shard name: (worker, traceback)} of failed shards."""
+        errors = {}
+        for path in sorted(self.results.glob('*.err')):
+            with open(path, 'rb') as fin:
+                errors[path.stem] = pickle.load(fin)
+        return errors
+
+    def requeue(self, is_lost):
+        """Put claimed shards back in the queue when is_lost(claim path, worker id) is true."""
+        for claim in self.claimed.iterdir():
+            name, worker = claim.name.split('@', 1)
+            try:
+                if not is_lost(claim, worker):
+                    continue
+                if (self.results / f'{name}.pkl').exists():
+                    claim.unlink()
+                else:
+                    os.rename(claim, self.tasks / f'{name}.pkl')
+            except FileNotFoundError:
+                pass  # finished in the meantime
+
+    def n_done(self):
+        return sum(1 for _ in self.results.glob('*.pkl'))
+
+    def load_results(self):
+        preds = []
+        for path in sorted(self.results.glob('*.pkl')):
+            with open(path, 'rb') as fin:
+                preds += pickle.load(fin)
+        return preds
+
+class _Heartbeat:
+    """Touches the claim file every interval seconds while a shard is being fitted."""
+    def __init__(self, path, interval):
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._beat, daemon=True)
+
+    def _beat(self):
+        while not self._stop.wait(self.interval):
+            try:
+                os.utime(self.path)
+            except FileNotFoundError:
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+def run_worker(queue_dir, idle_timeout=None, poll=1.0, heartbeat=30.0):
+    """
+    Process shards of every job under queue_dir until idle for idle_timeout seconds
+    (forever when None). Returns the number of shards processed.
+    """
+    worker = worker_id()
+    jobs, processed = {}, 0
+    idle_since = time.time()
+    while True:
+        claimed = None
+        for job_dir in sorted(Path(queue_dir).glob('job-*')):
+            queue = FileQueue(job_dir)
+            if queue.spec_path.exists() and queue.tasks.exists():
+                claimed = queue.claim(worker)
+                if claimed:
+                    break
+        if claimed is None:
+            if idle_timeout is not None and time.time() - idle_since > idle_timeout:
+                return processed
+            time.sleep(poll)
+            continue
+
+        name, shard, claim = claimed
+        if job_dir not in jobs:
+            spec = queue.load_spec()
+            jobs[job_dir] = (spec, FeatureStore(spec['store']).get(spec['X']))
+        spec, X = jobs[job_dir]
+        try:
+            with _Heartbeat(claim, heartbeat):
+                preds = [
+                    (c, f, _fit_and_predict(spec['model'], spec['candidates'][c], X, spec['y'], *spec['folds'][f]))
+                    for c, f in shard
+                ]
+        except Exception:
+            # reported to the coordinator instead of killing the worker, which would only get
+            # the shard requeued and fail it again
+            queue.fail(name, (worker, traceback.format_exc()), claim)
+        else:
+            queue.complete(name, preds, claim)
+        processed += 1
+        idle_since = time.time()
+
+def start_local_worker(queue_dir, poll=1.0, heartbeat=30.0):
+    proc = multiprocessing.Process(target=run_worker, args=(str(queue_dir),),
+                                   kwargs={'poll': poll, 'heartbeat': heartbeat}, daemon=True)
+    proc.start()
+    return proc
+
+def _describe(obj):
+    """Stable description of an estimator or parameter: no memory addresses, so it survives restarts."""
+    if hasattr(obj, 'get_params') and not isinstance(obj, type):
+        return [type(obj).__name__, _describe(obj.get_params(deep=False))]
+    if isinstance(obj, dict):
+        return {str(k): _describe(v) for k, v in sorted(obj.items(), key=lambda kv: str(kv[0]))}
+    if isinstance(obj, (list, tuple)):
+        return [_describe(v) for v in obj]
+    if callable(obj):
+        return f"{getattr(obj, '__module__', '')}.{getattr(obj, '__qualname__', type(obj).__name__)}"
+    return repr(obj)
+
+def _job_key(x_key, y, folds, model, candidates):
+    """Identifies the (candidate, fold) fits of a search, independent of how they are sharded."""
+    description = json.dumps([x_key, _describe(model), _describe(candidates)])
+    h = hashlib.sha1(description.encode())
+    h.update(np.ascontiguousarray(y).data)
+    for _, test_idx in folds:
+        h.update(np.ascontiguousarray(test_idx).data)
+    return h.hexdigest()[:16]
+
+def distributed_search(model, grid, X, y, groups, *, queue_dir=None, n_workers=None, shard_size=None,
+                       n_splits=None, scoring=roc_auc_score, store=None, random_state=0, refit=True,
+                       stale_after=600.0, poll=1.0, timeout=None) -> GroupedSearchResult:
+    """
+    grouped_search over a FileQueue. Every (candidate, fold) pair is fitted, there is no
+    early stopping across shards.
+
+    Parameters:
+    - queue_dir (str): shared directory holding the jobs, defaults to <RESULTS_DIR>/queue/
+    - n_workers (int): local worker processes to start (default: one per CPU); 0 relies on
+      workers started elsewhere with `python -m src.classifiers.distributed worker <queue_dir>`
+    - shard_size (int): (candidate, fold) pairs per shard, default ~4 shards per worker; a
+      resumed job keeps the sharding it was created with
+    - store (FeatureStore): must live on the shared filesystem when workers run on other machines
+    - stale_after (float): seconds without heartbeat after which a claimed shard is requeued
+    - timeout (float): raise TimeoutError if the shards are not all done after this many seconds
+    """
+    y = np.asarray(y)
+    groups = np.asarray(groups)
+    store = store or FeatureStore()
+    x_key = store.put(X)
+    X = store.get(x_key)
+    folds = group_folds(y, groups, n_splits, random_state)
+    candidates = list(ParameterGrid(grid))
+
+    n_workers = os.cpu_count() if n_workers is None else n_workers
+    pairs = [(c, f) for f in range(len(folds)) for c in range(len(candidates))]
+    shard_size = shard_size or max(1, len(pairs) // (4 * max(n_workers, 1)))
+    shards = [pairs[i:i + shard_size] for i in range(0, len(pairs), shard_size)]
+
+    queue_dir = Path(queue_dir or f'{config.RESULTS_DIR}/queue/')
+    queue = FileQueue(queue_dir / f'job-{_job_key(x_key, y, folds, model, candidates)}')
+    shards = queue.create({
+        'model': model, 'candidates': candidates, 'folds': folds, 'y': y,
+        'store': str(store.root.resolve()), 'X': x_key,
+    }, shards)
+
+    heartbeat = stale_after / 4
+    workers = [start_local_worker(queue_dir, poll, heartbeat) for _ in range(n_workers)]
+    dead = set()
+    start = time.time()
+    try:
+        with PROFILER.stage('distributed_search', model=type(model).__name__, shards=len(shards)) as rec:
+            while queue.n_done() < len(shards):
+                errors = queue.errors()
+                if errors:
+                    name, (worker, tb) = next(iter(errors.items()))
+                    raise RuntimeError(f'{len(errors)} shard(s) of {queue.dir} failed, shard {name} on {worker}:\n{tb}')
+                for k, proc in enumerate(workers):
+                    if not proc.is_alive():
+                        dead.add(worker_id(proc.pid))
+                        workers[k] = start_local_worker(queue_dir, poll, heartbeat)
+                queue.requeue(lambda claim, worker: worker in dead or _is_dead(worker)
+                              or time.time() - claim.stat().st_mtime > stale_after)
+                if timeout is not None and time.time() - start > timeout:
+                    raise TimeoutError(f'{len(shards) - queue.n_done()} of {len(shards)} shards unfinished in {queue.dir}')
+                time.sleep(poll)
+            rec['items'] = len(pairs)
+    finally:
+        for proc in workers:
+            proc.terminate()
+            proc.join()
+
+    oof = np.full((len(candidates), len(y)), np.nan)
+    for c, f, pred in queue.load_results():
+        oof[c, folds[f][1]] = pred
+    scores = [_pooled_score(y, oof[c], scoring) for c in range(len(candidates))]
+    finished = [c for c in range(len(candidates)) if scores[c] is not None]
+    assert finished, 'no candidate could be scored, every fold set contained a single class'
+    best = max(finished, key=lambda c: scores[c])
+
+    best_estimator = None
+    if refit:
+        best_estimator = clone(model).set_params(**candidates[best])
+        best_estimator.fit(X, y)
+
+    cv_results = {
+        'params': candidates,
+        'pooled_score': scores,
+        'folds_completed': [len(folds)] * len(candidates),
+        'stopped_early': [False] * len(candidates),
+    }
+    return GroupedSearchResult(candidates[best], best_estimator, scores[best], cv_results)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m src.classifiers.distributed')
+    commands = parser.add_subparsers(dest='command', required=True)
+    worker = commands.add_parser('worker', help='process search shards from a shared queue directory')
+    worker.add_argument('queue_dir')
+    worker.add_argument('--idle-timeout', type=float, default=None, help='exit after this many idle seconds')
+    worker.add_argument('--poll', type=float, default=1.0)
+    worker.add_argument('--heartbeat', type=float, default=30.0)
+    worker.add_argument('--profile', default=None, metavar='TRACE',
+                        help='record a cv_fit stage per fit in this profiler trace (see src.utils.profiler)')
+    args = parser.parse_args(argv)
+
+    if args.profile:
+        PROFILER.enable(args.profile)
+    n = run_worker(args.queue_dir, idle_timeout=args.idle_timeout, poll=args.poll, heartbeat=args.heartbeat)
+    print(f'{worker_id()}: {n} shards processed', file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -2,9 +2,12 @@ import pandas as pd
 
 from sklearn.ensemble import VotingClassifier, StackingClassifier
 from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import confusion_matrix, classification_report, roc_auc_score, roc_curve, auc
+from sklearn.metrics import classification_report
 
 from src.classifiers.classical import model_defs, CLASSICAL_MODELS
+from src.metrics import METRICS, BinaryMetrics, label_confusion_matrix
+from src.bootstrap import bootstrap_metrics, add_intervals
+from src.utils.profiler import PROFILER
 
 ENSEMBLE_MODELS = ["Voting", "Stacking"]
 def _model_defs(name, estimators):
@@ -14,7 +17,7 @@ def _model_defs(name, estimators):
         return StackingClassifier(estimators=estimators, final_estimator=LogisticRegression())
     return
 
-def classify(models_ran, name, train, test, confusion_matrices={}, roc_curves={}, train_auc={}, test_auc={}, best_params_all={}):
+def classify(models_ran, name, train, test, confusion_matrices={}, roc_curves={}, train_auc={}, test_auc={}, best_params_all={}, auc_ci={}):
     """
     Parameters:
     - name (String)
@@ -25,14 +28,27 @@ def classify(models_ran, name, train, test, confusion_matrices={}, roc_curves={}
             (v, _) = model_defs(m)
             estimators.append((m, v))
     model = _model_defs(name, estimators)
-    model.fit(train.X_scaled, train.y)
-    y_prob = model.predict_proba(test.X_scaled)[:,1]
-    y_pred = model.predict(test.X_scaled)
+    with PROFILER.stage('fit', model=name) as rec:
+        model.fit(train.X_scaled, train.y)
+        rec['items'] = len(train.y)
+    with PROFILER.stage('predict', model=name) as rec:
+        y_prob = model.predict_proba(test.X_scaled)[:,1]
+        y_pred = model.predict(test.X_scaled)
+        rec['items'] = len(test.y)
     
-    confusion_matrices[name] = confusion_matrix(test.y, y_pred)
+    confusion_matrices[name] = label_confusion_matrix(test.y, y_pred)
     roc_curves[name] = (test.y, y_prob)
-    train_auc[name] = roc_auc_score(train.y, model.predict_proba(train.X_scaled)[:,1])
-    test_auc[name] = roc_auc_score(test.y, y_prob)
+    train_prob = model.predict_proba(train.X_scaled)[:,1]
+    train_auc[name] = BinaryMetrics(train.y, train_prob).auc
+    test_auc[name] = METRICS.get(name, test.y, y_prob).auc
+
+    train_ci = bootstrap_metrics(train.y, train_prob, groups=getattr(train, 'groups', None))
+    test_ci = bootstrap_metrics(test.y, y_prob, y_pred, groups=getattr(test, 'groups', None))
+    auc_ci[name] = (train_ci['auc'], test_ci['auc'])
+
     df = pd.DataFrame(classification_report(test.y, y_pred, output_dict=True)).transpose()
     df['model'] = name
+    df['train_auc'], df['test_auc'] = train_auc[name], test_auc[name]
+    add_intervals(df, {'auc': train_ci['auc']}, prefix='train_')
+    add_intervals(df, test_ci, prefix='test_')
     return df
\ No newline at end of file
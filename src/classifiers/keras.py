@@ -1,6 +1,5 @@
 
 from sklearn.base import BaseEstimator, ClassifierMixin
-from tensorflow.keras.callbacks import EarlyStopping
 
 class MyKerasClassifier(BaseEstimator, ClassifierMixin):
     def __init__(self, build_fn, batch_size=32, epochs=10, verbose=0):
@@ -30,6 +29,8 @@ class MyKerasClassifier(BaseEstimator, ClassifierMixin):
         }
 
     def fit(self, X, y):
+        from tensorflow.keras.callbacks import EarlyStopping
+
         features = X.shape[-1]
         self.model_ = self.build_fn(features=features, **self._build_params)
         self.model_.fit(X, y, epochs=self.epochs, batch_size=self.batch_size,
@@ -0,0 +1,190 @@
+import json
+import time
+import numpy as np
+
+from src.metrics import BinaryMetrics
+
+WEIGHT_DTYPES = ['float32', 'float16', 'int8']
+
+_ACTIVATIONS = {
+    'linear': lambda x: x,
+    'relu': lambda x: np.maximum(x, 0),
+    'tanh': np.tanh,
+    'sigmoid': lambda x: 0.5 * (1 + np.tanh(0.5 * x)),
+}
+
+def _activation(name):
+    assert name in _ACTIVATIONS, f'activation {name} is not supported by the NumPy runtime'
+    return _ACTIVATIONS[name]
+
+def _quantize(w, dtype):
+    """int8 uses one symmetric scale per output unit (last axis)."""
+    if dtype == 'int8':
+        axes = tuple(range(w.ndim - 1))
+        scale = np.abs(w).max(axis=axes) / 127 if w.ndim > 1 else np.array(np.abs(w).max() / 127)
+        scale = np.where(scale == 0, 1, scale).astype(np.float32)
+        return {'q': np.round(w / scale).astype(np.int8), 'scale': scale}
+    return {'q': w.astype(dtype)}
+
+def _dequantize(arrays):
+    w = arrays['q'].astype(np.float32)
+    return w * arrays['scale'] if 'scale' in arrays else w
+
+def _layer_spec(layer):
+    """(spec, weights) for a Keras layer, or None for layers that are no-ops at inference."""
+    kind = type(layer).__name__
+    cfg = layer.get_config()
+    if kind in ('InputLayer', 'Dropout'):
+        return None
+    if kind == 'Flatten':
+        return {'kind': kind}, []
+    if kind == 'Dense':
+        return {'kind': kind, 'activation': cfg['activation']}, layer.get_weights()
+    if kind == 'LSTM':
+        assert not cfg.get('go_backwards') and not cfg.get('stateful'), 'only forward, stateless LSTMs are supported'
+        return {'kind': kind, 'units': cfg['units'], 'activation': cfg['activation'],
+                'recurrent_activation': cfg['recurrent_activation'],
+                'return_sequences': cfg.get('return_sequences', False)}, layer.get_weights()
+    if kind == 'Conv1D':
+        assert cfg['padding'] == 'valid' and tuple(cfg['dilation_rate']) == (1,), 'only valid, undilated Conv1D is supported'
+        return {'kind': kind, 'strides': cfg['strides'][0], 'activation': cfg['activation']}, layer.get_weights()
+    if kind == 'MaxPooling1D':
+        assert cfg['padding'] == 'valid', 'only valid MaxPooling1D is supported'
+        strides = cfg.get('strides') or cfg['pool_size']
+        return {'kind': kind, 'pool_size': cfg['pool_size'][0],
+                'strides': strides[0] if isinstance(strides, (list, tuple)) else strides}, []
+    raise TypeError(f'{kind} layers are not supported by the NumPy runtime')
+
+def _dense(x, spec, w):
+    y = x @ w[0]
+    if len(w) > 1:
+        y += w[1]
+    return _activation(spec['activation'])(y)
+
+def _lstm(x, spec, w):
+    kernel, recurrent = w[0], w[1]
+    bias = w[2] if len(w) > 2 else 0
+    u = spec['units']
+    act, rec_act = _activation(spec['activation']), _activation(spec['recurrent_activation'])
+    # input projections for every timestep at once; keras gate order is i, f, c, o
+    xw = x @ kernel + bias
+    h = np.zeros((len(x), u), dtype=np.float32)
+    c = np.zeros((len(x), u), dtype=np.float32)
+    outputs = []
+    for t in range(x.shape[1]):
+        z = xw[:, t] + h @ recurrent
+        i, f, o = rec_act(z[:, :u]), rec_act(z[:, u:2 * u]), rec_act(z[:, 3 * u:])
+        c = f * c + i * act(z[:, 2 * u:3 * u])
+        h = o * act(c)
+        if spec['return_sequences']:
+            outputs.append(h)
+    return np.stack(outputs, axis=1) if spec['return_sequences'] else h
+
+def _conv1d(x, spec, w):
+    kernel = w[0]
+    windows = np.lib.stride_tricks.sliding_window_view(x, kernel.shape[0], axis=1)[:, ::spec['strides']]
+    y = np.einsum('ntck,kcf->ntf', windows, kernel, optimize=True)
+    if len(w) > 1:
+        y += w[1]
+    return _activation(spec['activation'])(y)
+
+def _maxpool1d(x, spec, w):
+    windows = np.lib.stride_tricks.sliding_window_view(x, spec['pool_size'], axis=1)[:, ::spec['strides']]
+    return windows.max(axis=-1)
+
+_FORWARD = {
+    'Dense': _dense,
+    'LSTM': _lstm,
+    'Conv1D': _conv1d,
+    'MaxPooling1D': _maxpool1d,
+    'Flatten': lambda x, spec, w: x.reshape(len(x), -1),
+}
+
+class EdgeModel:
+    """
+    Dependency-light copy of a trained build_lstm/build_cnn model: layer specs plus weights,
+    evaluated with NumPy only. Weights are stored as float32, float16 or int8 and
+    dequantized to float32 once at load time.
+    """
+    def __init__(self, specs, weights, weight_dtype='float32'):
+        self.specs = specs
+        self.weights = weights
+        self.weight_dtype = weight_dtype
+
+    def forward(self, X):
+        x = np.asarray(X, dtype=np.float32)
+        for spec, w in zip(self.specs, self.weights):
+            x = _FORWARD[spec['kind']](x, spec, w)
+        return x
+
+    def predict_proba(self, X):
+        return self.forward(X)
+
+    def predict(self, X):
+        return (self.forward(X) > 0.5).astype('int32')
+
+    @staticmethod
+    def load(path):
+        with np.load(path, allow_pickle=False) as f:
+            meta = json.loads(str(f['meta']))
+            weights = [
+                [_dequantize({k: f[f'{i}/{j}/{k}'] for k in ('q', 'scale') if f'{i}/{j}/{k}' in f.files})
+                 for j in range(n)]
+                for i, n in enumerate(meta['n_weights'])
+            ]
+        return EdgeModel(meta['specs'], weights, meta['weight_dtype'])
+
+def export_keras(clf, path, weight_dtype='int8') -> EdgeModel:
+    """
+    Write a fitted MyKerasClassifier (or a bare Keras Sequential model) to a single .npz
+    artifact and return the model as loaded back from it.
+    """
+    assert weight_dtype in WEIGHT_DTYPES, f'weight_dtype must be one of {WEIGHT_DTYPES}'
+    model = getattr(clf, 'model_', clf)
+    specs, arrays, n_weights = [], {}, []
+    for layer in model.layers:
+        spec = _layer_spec(layer)
+        if spec is None:
+            continue
+        spec, weights = spec
+        for j, w in enumerate(weights):
+            for k, v in _quantize(np.asarray(w, dtype=np.float32), weight_dtype).items():
+                arrays[f'{len(specs)}/{j}/{k}'] = v
+        specs.append(spec)
+        n_weights.append(len(weights))
+    meta = {'specs': specs, 'n_weights': n_weights, 'weight_dtype': weight_dtype}
+    np.savez(path, meta=np.array(json.dumps(meta)), **arrays)
+    return EdgeModel.load(path if str(path).endswith('.npz') else f'{path}.npz')
+
+def delta_report(clf, edge: EdgeModel, X, y=None, repeats=100):
+    """
+    Compare an exported EdgeModel against the original classifier on X: probability
+    differences, decision agreement, AUC/accuracy when labels are given, and single-window latency.
+    """
+    model = getattr(clf, 'model_', clf)
+    original = np.asarray(model.predict(X, verbose=0)).ravel()
+    exported = edge.predict_proba(X).ravel()
+    diff = np.abs(original - exported)
+    report = {
+        'weight_dtype': edge.weight_dtype,
+        'max_abs_diff': float(diff.max()),
+        'mean_abs_diff': float(diff.mean()),
+        'decision_agreement': float(np.mean((original > 0.5) == (exported > 0.5))),
+    }
+    if y is not None:
+        y = np.asarray(y).ravel() != 0
+        report['accuracy_original'] = float(np.mean((original > 0.5) == y))
+        report['accuracy_exported'] = float(np.mean((exported > 0.5) == y))
+        if 0 < y.sum() < len(y):
+            report['auc_original'] = BinaryMetrics(y, original).auc
+            report['auc_exported'] = BinaryMetrics(y, exported).auc
+
+    window = np.asarray(X[:1], dtype=np.float32)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        edge.forward(window)
+    report['single_window_ms'] = (time.perf_counter() - start) / repeats * 1000
+    report['weight_bytes'] = int(sum(
+        np.asarray(w).size * np.dtype(edge.weight_dtype).itemsize for ws in edge.weights for w in ws
+    ))
+    return report
@@ -0,0 +1,209 @@
+import numpy as np
+
+from scipy.special import expit
+from sklearn.dummy import DummyClassifier
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+
+class FlatForest:
+    """
+    A fitted RandomForestClassifier or binary GradientBoostingClassifier flattened into
+    contiguous node arrays, with a NumPy evaluator that walks all trees for a batch at once.
+
+    The evaluator reproduces sklearn's arithmetic step by step (float32 inputs, per-tree
+    normalized leaf values for forests, learning-rate-scaled raw scores for boosting, trees
+    accumulated in estimator order) so predict_proba is bit-identical to the original model.
+
+    Per call it costs a few NumPy operations per tree level instead of sklearn's per-tree
+    dispatch, so it is much faster for small batches (single windows on a device); on large
+    batches sklearn's compiled tree walk stays ahead.
+    """
+    def __init__(self, kind, feature, threshold, left, right, missing_left, value, roots, max_depth,
+                 used_features, n_features_in, classes, learning_rate=None, init_raw=None):
+        self.kind = kind
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.used_features = used_features
+        self.n_features_in = int(n_features_in)
+        self.classes = classes
+        self.learning_rate = learning_rate
+        self.init_raw = init_raw
+        self._is_split = left != np.arange(len(left))
+        # (left, right) of node i at 2 * i, 2 * i + 1, one take() per step picks the child
+        self._children = np.column_stack([left, right]).ravel()
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for k, a in self.__dict__.items() if isinstance(a, np.ndarray) and not k.startswith('_'))
+
+    def _leaves(self, X, batch_size):
+        """Leaf node reached in every tree, tree-major: shape (n_trees, n_samples), C-contiguous."""
+        X = np.asarray(X)
+        assert X.shape[1] == self.n_features_in, f'expected {self.n_features_in} features, got {X.shape[1]}'
+        X = np.ascontiguousarray(X[:, self.used_features], dtype=np.float32)
+        leaves = np.empty((self.n_trees, len(X)), dtype=np.int32)
+        for start in range(0, len(X), batch_size):
+            Xb = X[start:start + batch_size]
+            flat_x = Xb.ravel()
+            node = np.repeat(self.roots, len(Xb))
+            row_offset = np.tile(np.arange(len(Xb), dtype=np.int64) * Xb.shape[1], self.n_trees)
+            # only the (tree, row) pairs still at a split are advanced: shallow trees and early
+            # leaves cost nothing more and the walk ends as soon as every pair is at a leaf
+            active = np.flatnonzero(self._is_split.take(node))
+            while len(active):
+                at = node.take(active)
+                x = flat_x.take(row_offset.take(active) + self.feature.take(at))
+                go_left = x <= self.threshold.take(at)
+                missing = np.isnan(x)
+                if missing.any():
+                    go_left = np.where(missing, self.missing_left.take(at), go_left)
+                at = self._children.take(2 * at + ~go_left)
+                node[active] = at
+                split = self._is_split.take(at)
+                if not split.all():
+                    active = active.compress(split)
+            leaves[:, start:start + batch_size] = node.reshape(self.n_trees, len(Xb))
+        return leaves
+
+    def apply(self, X, batch_size=4096):
+        """Leaf node (global index) reached in every tree, shape (n_samples, n_trees)."""
+        return self._leaves(X, batch_size).T
+
+    def predict_proba(self, X, batch_size=4096):
+        leaves = self._leaves(X, batch_size)
+        n = leaves.shape[1]
+        if self.kind == 'forest':
+            proba = np.empty((n, len(self.classes)), dtype=np.float64)
+        else:
+            raw = np.empty(n, dtype=np.float64)
+        for start in range(0, n, batch_size):
+            # one gather of the batch's leaf values, tree-major and contiguous, so reducing over
+            # the tree axis adds whole rows tree after tree: sklearn's accumulation order
+            values = self.value.take(np.ascontiguousarray(leaves[:, start:start + batch_size]), axis=0)
+            if self.kind == 'forest':
+                proba[start:start + batch_size] = np.add.reduce(values, axis=0)
+            else:
+                init = np.full((1, values.shape[1]), self.init_raw)
+                raw[start:start + batch_size] = np.add.reduce(np.concatenate([init, self.learning_rate * values]), axis=0)
+        if self.kind == 'forest':
+            proba /= self.n_trees
+            return proba
+
+        proba = np.empty((n, 2), dtype=np.float64)
+        proba[:, 1] = expit(raw)
+        proba[:, 0] = 1 - proba[:, 1]
+        return proba
+
+    def predict(self, X, batch_size=4096):
+        return self.classes.take(np.argmax(self.predict_proba(X, batch_size), axis=1), axis=0)
+
+    def save(self, path):
+        arrays = {k: v for k, v in self.__dict__.items() if v is not None and not k.startswith('_')}
+        np.savez(path, **arrays)
+
+    @staticmethod
+    def load(path):
+        with np.load(path, allow_pickle=False) as f:
+            obj = {k: f[k] for k in f.files}
+        obj['kind'] = str(obj['kind'])
+        for key in ('learning_rate', 'init_raw'):
+            if key in obj:
+                obj[key] = float(obj[key])
+        return FlatForest(**obj)
+
+def _float32_floor(threshold):
+    """
+    Largest float32 <= each float64 threshold. Inputs are compared as float32, so
+    x <= t holds exactly when x <= floor32(t) and predictions are unchanged.
+    """
+    t32 = threshold.astype(np.float32)
+    too_high = t32.astype(np.float64) > threshold
+    t32[too_high] = np.nextafter(t32[too_high], np.float32(-np.inf))
+    return t32
+
+def _flatten(trees, leaf_value):
+    feature, threshold, left, right, missing_left, value, roots = [], [], [], [], [], [], []
+    offset, max_depth = 0, 0
+    for tree in trees:
+        t = tree.tree_
+        nodes = t.__getstate__()['nodes']
+        is_leaf = t.children_left == -1
+        idx = np.arange(t.node_count) + offset
+        roots.append(offset)
+        feature.append(np.where(is_leaf, 0, t.feature))
+        threshold.append(np.where(is_leaf, np.inf, t.threshold))
+        # leaves point at themselves, a node is a split when its left child is another node
+        left.append(np.where(is_leaf, idx, t.children_left + offset))
+        right.append(np.where(is_leaf, idx, t.children_right + offset))
+        missing_left.append(nodes['missing_go_to_left'].astype(bool) if 'missing_go_to_left' in nodes.dtype.names
+                            else np.zeros(t.node_count, dtype=bool))
+        value.append(leaf_value(tree))
+        offset += t.node_count
+        max_depth = max(max_depth, t.max_depth)
+    return (np.concatenate(feature), np.concatenate(threshold), np.concatenate(left), np.concatenate(right),
+            np.concatenate(missing_left), np.concatenate(value), np.array(roots), max_depth)
+
+def _forest_leaf_value(n_classes):
+    def leaf_value(tree):
+        # newer sklearn stores class fractions and predict_proba returns them as they are,
+        # older versions store counts and normalize them in predict_proba
+        proba = tree.tree_.value[:, 0, :n_classes].copy()
+        normalizer = proba.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.0] = 1.0
+        if not np.allclose(normalizer, 1.0):
+            proba /= normalizer
+        return proba
+    return leaf_value
+
+def export_tree_ensemble(est, float32_thresholds=False, prune_features=True, X_check=None) -> FlatForest:
+    """
+    Flatten a fitted RandomForestClassifier or binary GradientBoostingClassifier, e.g. the
+    best_estimator_ returned by get_best.
+
+    Parameters:
+    - float32_thresholds (bool): store thresholds as float32, rounded down so splits are unchanged
+    - prune_features (bool): keep only the input columns some split uses
+    - X_check (array): if given, assert predict_proba matches sklearn bit for bit on it
+    """
+    if isinstance(est, RandomForestClassifier):
+        kind, trees = 'forest', est.estimators_
+        leaf_value, learning_rate, init_raw = _forest_leaf_value(est.n_classes_), None, None
+    elif isinstance(est, GradientBoostingClassifier):
+        assert est.n_classes_ == 2, 'only binary GradientBoostingClassifier can be exported'
+        assert est.init_ == 'zero' or isinstance(est.init_, DummyClassifier), \
+            'only constant (zero or prior) init estimators can be exported'
+        kind, trees = 'boosting', est.estimators_[:, 0]
+        leaf_value, learning_rate = (lambda tree: tree.tree_.value[:, 0, 0].copy()), float(est.learning_rate)
+        init_raw = float(est._raw_predict_init(np.zeros((1, est.n_features_in_), dtype=np.float32))[0, 0])
+    else:
+        raise TypeError(f'{type(est).__name__} cannot be exported, expected RandomForestClassifier or GradientBoostingClassifier')
+
+    feature, threshold, left, right, missing_left, value, roots, max_depth = _flatten(trees, leaf_value)
+
+    is_split = left != np.arange(len(left))
+    if prune_features:
+        used_features = np.unique(feature[is_split]) if is_split.any() else np.array([0])
+        feature = np.searchsorted(used_features, feature)
+    else:
+        used_features = np.arange(est.n_features_in_)
+    if float32_thresholds:
+        threshold = _float32_floor(threshold)
+
+    flat = FlatForest(
+        kind, feature.astype(np.int32), threshold, left.astype(np.int32), right.astype(np.int32),
+        missing_left, value, roots.astype(np.int32), max_depth, used_features.astype(np.int32),
+        est.n_features_in_, est.classes_, learning_rate=learning_rate, init_raw=init_raw
+    )
+    if X_check is not None:
+        assert np.array_equal(flat.predict_proba(X_check), est.predict_proba(X_check)), \
+            'exported model does not reproduce sklearn predict_proba'
+    return flat
@@ -0,0 +1,125 @@
+import numpy as np
+
+from joblib import Parallel, delayed, effective_n_jobs
+from sklearn.base import clone
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import LeaveOneGroupOut, StratifiedGroupKFold, ParameterGrid
+
+from src.data.feature_store import FeatureStore
+from src.utils.profiler import PROFILER
+
+class GroupedSearchResult:
+    """Same shape as the parts of GridSearchCV that get_best uses."""
+    def __init__(self, best_params_, best_estimator_, best_score_, cv_results_):
+        self.best_params_ = best_params_
+        self.best_estimator_ = best_estimator_
+        self.best_score_ = best_score_
+        self.cv_results_ = cv_results_
+
+def positive_proba(est, X):
+    prob = np.asarray(est.predict_proba(X))
+    return prob[:, -1] if prob.ndim == 2 else prob
+
+def group_folds(y, groups, n_splits=None, random_state=0):
+    """
+    Leave-one-group-out when n_splits is None, otherwise stratified group k-fold.
+    LOGO folds are shuffled so that early folds mix healthy and runaway cells.
+    """
+    if n_splits is None:
+        folds = list(LeaveOneGroupOut().split(np.zeros(len(y)), y, groups))
+        np.random.RandomState(random_state).shuffle(folds)
+        return folds
+    splitter = StratifiedGroupKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+    return list(splitter.split(np.zeros(len(y)), y, groups))
+
+def _fit_and_predict(model, params, X, y, train_idx, test_idx):
+    with PROFILER.stage('cv_fit', model=type(model).__name__, params=params) as rec:
+        est = clone(model).set_params(**params)
+        est.fit(X[train_idx], y[train_idx])
+        rec['items'] = len(train_idx)
+    return positive_proba(est, X[test_idx])
+
+def _pooled_score(y, oof, scoring):
+    seen = ~np.isnan(oof)
+    if len(np.unique(y[seen])) < 2:
+        return None
+    return scoring(y[seen], oof[seen])
+
+def grouped_search(model, grid, X, y, groups, *, n_splits=None, scoring=roc_auc_score, n_jobs=-1,
+                   tolerance=0.05, min_folds=5, store=None, random_state=0, refit=True) -> GroupedSearchResult:
+    """
+    Grid search with folds keyed on cell groups.
+
+    A single held-out cell only contains one class, so folds are not scored one by one:
+    out-of-fold probabilities are pooled and scored together. Folds run in rounds, all
+    (candidate, fold) pairs of a round in parallel; after each round, once min_folds folds
+    holding each class are in, candidates whose pooled score trails the leader by more than
+    tolerance are dropped. With leave-one-group-out this means min_folds healthy and
+    min_folds runaway cells, so a handful of cells cannot knock a candidate out.
+
+    X is written once to a FeatureStore and handed to the workers as a read-only memmap,
+    so repeated searches over the same features (one per model) reuse the same file.
+
+    Parameters:
+    - model: unfitted estimator with predict_proba
+    - grid (dict): parameter grid as in GridSearchCV
+    - groups (array): per-sample group, e.g. WindowedData.groups
+    - n_splits (int): None for leave-one-group-out
+    - tolerance (float): set to None to disable early stopping
+    - min_folds (int): folds per class scored before any candidate is dropped
+    """
+    y = np.asarray(y)
+    groups = np.asarray(groups)
+    X = (store or FeatureStore()).memmap(X)
+    folds = group_folds(y, groups, n_splits, random_state)
+    candidates = list(ParameterGrid(grid))
+    classes = np.unique(y)
+    # folds seen so far that hold each class in their test set
+    class_folds = np.zeros(len(classes), dtype=int)
+
+    oof = np.full((len(candidates), len(y)), np.nan)
+    folds_done = np.zeros(len(candidates), dtype=int)
+    scores = [None] * len(candidates)
+    alive = list(range(len(candidates)))
+    n_jobs = effective_n_jobs(n_jobs)
+
+    with Parallel(n_jobs=n_jobs) as parallel:
+        start = 0
+        while start < len(folds) and alive:
+            step = max(1, min_folds if start == 0 else n_jobs // len(alive))
+            batch = folds[start:start + step]
+            tasks = [(c, test_idx) for c in alive for (_, test_idx) in batch]
+            preds = parallel(
+                delayed(_fit_and_predict)(model, candidates[c], X, y, train_idx, test_idx)
+                for c in alive for (train_idx, test_idx) in batch
+            )
+            for (c, test_idx), pred in zip(tasks, preds):
+                oof[c, test_idx] = pred
+            for _, test_idx in batch:
+                class_folds += np.isin(classes, y[test_idx])
+            start += len(batch)
+
+            for c in alive:
+                folds_done[c] = start
+                scores[c] = _pooled_score(y, oof[c], scoring)
+            known = [scores[c] for c in alive if scores[c] is not None]
+            if tolerance is not None and class_folds.min() >= min_folds and known:
+                lead = max(known)
+                alive = [c for c in alive if scores[c] is None or scores[c] >= lead - tolerance]
+
+    finished = [c for c in alive if scores[c] is not None]
+    assert finished, 'no candidate could be scored, every fold set contained a single class'
+    best = max(finished, key=lambda c: scores[c])
+
+    best_estimator = None
+    if refit:
+        best_estimator = clone(model).set_params(**candidates[best])
+        best_estimator.fit(X, y)
+
+    cv_results = {
+        'params': candidates,
+        'pooled_score': scores,
+        'folds_completed': folds_done.tolist(),
+        'stopped_early': [c not in alive for c in range(len(candidates))],
+    }
+    return GroupedSearchResult(candidates[best], best_estimator, scores[best], cv_results)
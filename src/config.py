@@ -5,4 +5,6 @@ class config:
     PROCESSED_DATA_DIR = "data/preprocessed/"
     RESULTS_DIR = "results/"
     WINDOW_SIZE = 100
-    STRIDE = 1
\ No newline at end of file
+    STRIDE = 1
+    BUILD_PYRAMIDS = True
+    CHUNKED_STORAGE = True
\ No newline at end of file
@@ -1,8 +1,11 @@
 # Based on Microsoft BatteryML repo
+import os
 import pickle
 import pandas as pd
 
 from typing import List
+from src.data.pyramid import build_pyramid, query_pyramid
+from src.data.chunk_store import ChunkStore, open_store
 
 class TimeseriesData:
    def __init__(self,
@@ -14,6 +17,7 @@ class TimeseriesData:
        self.time_in_s = time_in_s
        self.temperature_in_C = temperature_in_C
        self.description = description
+       self.pyramid = kwargs.pop('pyramid', None)
       
        self.additional_data = {}
        for key, val in kwargs.items():
@@ -31,6 +35,20 @@ class TimeseriesData:
   
    def display(self, n=None):
        return pd.DataFrame({'Time (s)': self.time_in_s, 'Temp (°C)': self.temperature_in_C}).head(n)
+
+   def build_pyramid(self):
+       """Precompute min/max/mean temperature at power-of-two decimation levels (see src.data.pyramid)."""
+       self.pyramid = build_pyramid(self.time_in_s, self.temperature_in_C)
+       return self
+
+   def query(self, t0=None, t1=None, max_points=2000):
+       """Temperature between t0 and t1 with at most max_points rows, from the coarsest adequate level."""
+       res = query_pyramid(getattr(self, 'pyramid', None), self.time_in_s, self.temperature_in_C, t0, t1, max_points)
+       df = pd.DataFrame({
+           'Time (s)': res['time'], 'Temp min (°C)': res['min'], 'Temp max (°C)': res['max'], 'Temp mean (°C)': res['mean']
+       })
+       df.attrs['level'] = res['level']
+       return df
   
    @staticmethod
    def load(obj):
@@ -92,10 +110,23 @@ class BatteryData:
   
    def to_df(self):
        return pd.DataFrame(self.timeseries_data.to_dict())
+
+   def query(self, t0=None, t1=None, max_points=2000):
+       """TimeseriesData.query for every timeseries of the cell."""
+       ts = self.timeseries_data if isinstance(self.timeseries_data, list) else [self.timeseries_data]
+       return [t.query(t0, t1, max_points) for t in ts]
   
-   def dump(self, path):
+   def dump(self, path, chunk_store: ChunkStore = None):
+       """
+       Pickle the cell to path. With a chunk_store, timeseries arrays are written to the
+       store and the pickle only keeps references to them (see src.data.chunk_store).
+       """
+       obj = self.to_dict()
+       if chunk_store is not None and isinstance(obj.get('timeseries_data'), list):
+           obj['timeseries_data'] = [chunk_store.externalize(ts) for ts in obj['timeseries_data']]
+           obj['chunk_root'] = os.path.relpath(chunk_store.root, os.path.dirname(os.path.abspath(path)))
        with open(path, 'wb') as fout:
-           pickle.dump(self.to_dict(), fout)
+           pickle.dump(obj, fout)
 
    def print_description(self):
        print(f'**************description of battery cell {self.cell_id}**************')
@@ -106,7 +137,15 @@ class BatteryData:
                print(f'{key}: {val}')
 
    @staticmethod
-   def load(path):
+   def load(path, mmap=False):
+       """
+       mmap: map chunked arrays as read-only memmaps instead of reading them. Each distinct
+       chunk then holds a file descriptor while referenced, so keep it for a few cells.
+       """
        with open(path, 'rb') as fin:
            obj = pickle.load(fin)
+       chunk_root = obj.pop('chunk_root', None)
+       if chunk_root is not None:
+           store = open_store(os.path.join(os.path.dirname(os.path.abspath(path)), chunk_root))
+           obj['timeseries_data'] = [store.internalize(ts, mmap) for ts in obj['timeseries_data']]
        return BatteryData(**obj)
@@ -0,0 +1,174 @@
+import os
+import copy
+import pickle
+import weakref
+import numpy as np
+import pandas as pd
+
+from glob import glob
+from pathlib import Path
+from src.config import config
+from src.data.feature_store import FeatureStore
+
+# all levels of a pyramid are packed into one chunk of these records
+PYRAMID_DTYPE = np.dtype([('time', np.float64), ('min', np.float32), ('max', np.float32), ('mean', np.float32)])
+
+class ChunkRef:
+    """Placeholder left in a pickled cell for an array or Series held in a ChunkStore."""
+    def __init__(self, key, nbytes, name=None, index=None, series=False):
+        self.key = key
+        self.nbytes = nbytes
+        self.name = name
+        self.index = index
+        self.series = series
+
+class ChunkStore(FeatureStore):
+    """
+    Content-addressed chunks for preprocessed arrays.
+
+    Every time axis, temperature channel and pyramid level is stored once under the hash of
+    its contents, so a time vector shared by six thermocouples, a column read twice, or a
+    *_MAX / *_MAX_2 pair of identical exports costs one file. The levels of a pyramid are
+    packed into a single chunk.
+
+    Chunks read back are shared: as long as a loaded cell holds on to a chunk, every other
+    reference to the same key gets the same array (or read-only memmap) instead of reading
+    or mapping the file again.
+    """
+    def __init__(self, root=None):
+        super().__init__(root or f'{config.PROCESSED_DATA_DIR}/chunks/')
+        self.logical_bytes = 0
+        self._unique = {}
+        self._loaded = weakref.WeakValueDictionary()
+
+    def put(self, array) -> str:
+        key = super().put(array)
+        self.logical_bytes += array.nbytes
+        self._unique[key] = array.nbytes
+        return key
+
+    def stats(self):
+        """Bytes handed to put() since this store was opened versus the distinct chunks they map to."""
+        unique = sum(self._unique.values())
+        return {'logical_bytes': self.logical_bytes, 'unique_bytes': unique, 'saved_bytes': self.logical_bytes - unique}
+
+    def _ref(self, value):
+        """ChunkRef for numeric arrays/Series, anything else is returned unchanged."""
+        if isinstance(value, pd.Series) and value.dtype != object:
+            index = None
+            if not value.index.equals(pd.RangeIndex(len(value))):
+                index = self._ref(np.asarray(value.index))
+            values = value.to_numpy()
+            return ChunkRef(self.put(values), values.nbytes, name=value.name, index=index, series=True)
+        if isinstance(value, np.ndarray) and value.dtype != object:
+            return ChunkRef(self.put(value), value.nbytes)
+        return value
+
+    def load(self, key, mmap=False):
+        """Chunk key as an array, or a read-only memmap with mmap; reused while it is referenced."""
+        array = self._loaded.get((key, mmap))
+        if array is None:
+            array = self.get(key) if mmap else np.load(self.path(key))
+            self._loaded[(key, mmap)] = array
+        return array
+
+    def _deref(self, value, mmap=False):
+        if not isinstance(value, ChunkRef):
+            return value
+        array = self.load(value.key, mmap)
+        if not value.series:
+            return array
+        index = None if value.index is None else self._deref(value.index, mmap)
+        return pd.Series(array, index=index, name=value.name, copy=False)
+
+    def externalize(self, ts):
+        """Copy of a TimeseriesData with its arrays (and pyramid levels) replaced by ChunkRefs."""
+        out = copy.copy(ts)
+        out.time_in_s = self._ref(ts.time_in_s)
+        out.temperature_in_C = self._ref(ts.temperature_in_C)
+        out.additional_data = {k: self._ref(v) for k, v in ts.additional_data.items()}
+        pyramid = getattr(ts, 'pyramid', None)
+        if pyramid:
+            out.pyramid = self._pack_pyramid(pyramid)
+        return out
+
+    def internalize(self, ts, mmap=False):
+        """Inverse of externalize."""
+        out = copy.copy(ts)
+        out.time_in_s = self._deref(ts.time_in_s, mmap)
+        out.temperature_in_C = self._deref(ts.temperature_in_C, mmap)
+        out.additional_data = {k: self._deref(v, mmap) for k, v in ts.additional_data.items()}
+        pyramid = getattr(ts, 'pyramid', None)
+        if pyramid:
+            out.pyramid = self._unpack_pyramid(pyramid, mmap)
+        return out
+
+    def _pack_pyramid(self, pyramid):
+        levels = pyramid['levels']
+        bounds = np.cumsum([0] + [len(level['time']) for level in levels])
+        packed = np.empty(bounds[-1], dtype=PYRAMID_DTYPE)
+        for level, start, end in zip(levels, bounds[:-1], bounds[1:]):
+            for field in PYRAMID_DTYPE.names:
+                packed[field][start:end] = level[field]
+        return {**pyramid, 'order': self._ref(pyramid.get('order')), 'levels': self._ref(packed), 'bounds': bounds.tolist()}
+
+    def _unpack_pyramid(self, pyramid, mmap):
+        out = {k: v for k, v in pyramid.items() if k != 'bounds'}
+        out['order'] = self._deref(pyramid.get('order'), mmap)
+        if isinstance(pyramid['levels'], list):
+            # written before levels were packed: one chunk per level and field
+            out['levels'] = [{k: self._deref(v, mmap) for k, v in level.items()} for level in pyramid['levels']]
+            return out
+        packed, bounds = self._deref(pyramid['levels'], mmap), pyramid['bounds']
+        out['levels'] = [
+            {field: packed[field][start:end] for field in PYRAMID_DTYPE.names}
+            for start, end in zip(bounds[:-1], bounds[1:])
+        ]
+        return out
+
+_STORES = {}
+
+def open_store(root) -> ChunkStore:
+    """ChunkStore of root shared by every cell loaded from it, so loaded chunks are shared too."""
+    root = Path(root).resolve()
+    if root not in _STORES:
+        _STORES[root] = ChunkStore(root)
+    return _STORES[root]
+
+def _refs(obj):
+    if isinstance(obj, ChunkRef):
+        yield obj
+        if obj.index is not None:
+            yield obj.index
+    elif isinstance(obj, dict):
+        for v in obj.values():
+            yield from _refs(v)
+    elif isinstance(obj, (list, tuple)):
+        for v in obj:
+            yield from _refs(v)
+    elif hasattr(obj, '__dict__'):
+        yield from _refs(vars(obj))
+
+def dedup_report(processed_dir=None, store: ChunkStore = None):
+    """
+    Bytes referenced by the pickled cells under processed_dir versus bytes actually held in
+    the chunk store, without loading any chunk.
+    """
+    processed_dir = processed_dir or config.PROCESSED_DATA_DIR
+    store = store or ChunkStore(os.path.join(processed_dir, 'chunks'))
+    referenced, pkl_bytes, cells = 0, 0, 0
+    for path in glob(os.path.join(processed_dir, '**', '*.pkl'), recursive=True):
+        with open(path, 'rb') as fin:
+            obj = pickle.load(fin)
+        referenced += sum(ref.nbytes for ref in _refs(obj))
+        pkl_bytes += os.path.getsize(path)
+        cells += 1
+    stored = sum(os.path.getsize(f) for f in glob(str(store.root / '*.npy')))
+    return {
+        'cells': cells,
+        'referenced_bytes': referenced,
+        'stored_bytes': stored,
+        'pickle_bytes': pkl_bytes,
+        'saved_bytes': referenced - stored,
+        'dedup_ratio': referenced / stored if stored else None,
+    }
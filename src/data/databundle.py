@@ -0,0 +1,69 @@
+# Based on Microsoft BatteryML repo
+import torch
+import numpy as np
+
+from src.data.windowing import WindowedData
+
+def _as_tensor(value, dtype=torch.float32):
+    if value is None or isinstance(value, torch.Tensor):
+        return value
+    return torch.as_tensor(np.asarray(value), dtype=dtype)
+
+class Dataset(torch.utils.data.Dataset):
+    """Features and labels of one split, held as tensors."""
+    def __init__(self, feature, label=None):
+        self.feature = _as_tensor(feature)
+        self.label = _as_tensor(label)
+        assert self.label is None or len(self.label) == len(self.feature), 'feature and label lengths differ'
+
+    def __len__(self):
+        return len(self.feature)
+
+    def __getitem__(self, idx):
+        if self.label is None:
+            return self.feature[idx]
+        return self.feature[idx], self.label[idx]
+
+    def to(self, device: str):
+        return Dataset(self.feature.to(device), None if self.label is None else self.label.to(device))
+
+class DataBundle:
+    """
+    In-memory train/test input of BaseModel.fit / predict.
+
+    model.predict(dataset, data_type='test') reads dataset.test_data; data_type='train'
+    reads dataset.train_data. Transformations are kept so predictions can be mapped back.
+    """
+    def __init__(self,
+                 train_feature,
+                 train_label,
+                 test_feature=None,
+                 test_label=None,
+                 *,
+                 feature_transformation=None,
+                 label_transformation=None):
+        self.train_data = Dataset(train_feature, train_label)
+        self.test_data = Dataset(test_feature, test_label) if test_feature is not None else None
+        self.feature_transformation = feature_transformation
+        self.label_transformation = label_transformation
+
+    def __getitem__(self, data_type: str) -> Dataset:
+        assert data_type in ('train', 'test'), f'unknown data_type {data_type}'
+        data = self.train_data if data_type == 'train' else self.test_data
+        assert data is not None, f'no {data_type} data in this bundle'
+        return data
+
+    def to(self, device: str):
+        bundle = DataBundle.__new__(DataBundle)
+        bundle.train_data = self.train_data.to(device)
+        bundle.test_data = None if self.test_data is None else self.test_data.to(device)
+        bundle.feature_transformation = self.feature_transformation
+        bundle.label_transformation = self.label_transformation
+        return bundle
+
+    @staticmethod
+    def from_windows(train: WindowedData, test: WindowedData = None, scaled=False):
+        """Bundle of windowed cells; scaled uses X_scaled (see add_scaled_features)."""
+        attr = 'X_scaled' if scaled else 'X'
+        return DataBundle(getattr(train, attr), train.y,
+                          None if test is None else getattr(test, attr), None if test is None else test.y)
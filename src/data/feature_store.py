@@ -0,0 +1,52 @@
+import os
+import uuid
+import hashlib
+import numpy as np
+
+from pathlib import Path
+from src.config import config
+
+class FeatureStore:
+    """
+    Content-addressed cache of feature arrays on disk.
+
+    Arrays are written once as .npy files named after a hash of their contents and read
+    back as read-only memmaps, so worker processes share the same pages instead of each
+    receiving a pickled copy.
+    """
+    def __init__(self, root=None):
+        self.root = Path(root or f'{config.DATA_DIR}/cache/features/')
+
+    @staticmethod
+    def key(array) -> str:
+        array = np.ascontiguousarray(array)
+        h = hashlib.sha1(f'{array.dtype.str}{array.shape}'.encode())
+        h.update(array.data)
+        return h.hexdigest()
+
+    def path(self, key):
+        return self.root / f'{key}.npy'
+
+    def __contains__(self, key):
+        return self.path(key).exists()
+
+    def put(self, array) -> str:
+        if isinstance(array, np.memmap) and getattr(array, 'filename', None) \
+                and Path(array.filename).resolve().parent == self.root.resolve():
+            return Path(array.filename).stem
+        key = self.key(array)
+        if key not in self:
+            os.makedirs(self.root, exist_ok=True)
+            # unique per call: threads of one process (e.g. parallel pipeline stages) may
+            # write the same key at once; every copy is identical, so the last rename wins
+            tmp = self.root / f'{key}.{os.getpid()}.{uuid.uuid4().hex}.tmp'
+            with open(tmp, 'wb') as fout:
+                np.save(fout, np.ascontiguousarray(array))
+            os.replace(tmp, self.path(key))
+        return key
+
+    def get(self, key):
+        return np.load(self.path(key), mmap_mode='r')
+
+    def memmap(self, array):
+        return self.get(self.put(array))
@@ -0,0 +1,162 @@
+import re
+import numpy as np
+
+from typing import List
+from src.config import config
+from src.data.battery_data import BatteryData
+from src.data.windowing import WindowedData, get_timeseries, sliding_windows
+
+# lags (in samples) of the cross-channel correlations, 0 is always included
+LAGS = (1, 5, 10)
+# number of rFFT bands per channel
+N_BANDS = 8
+# windows per batch, bounds the size of the FFT and pairwise buffers
+BLOCK_SIZE = 2 ** 14
+# thermocouple series as written by the ORNL SNL/TCN readers ('tc1', 'tc1, positive-terminal', ...)
+THERMOCOUPLE = re.compile(r'^tc\d+\b', re.IGNORECASE)
+# runaway onset: the hottest thermocouple has risen this far above its starting temperature
+ONSET_RISE_C = 30.
+
+def thermocouples(cell: BatteryData):
+    """The cell's timeseries that are thermocouples of one array (SNL: 6, TCN: 4)."""
+    return [ts for ts in get_timeseries(cell) if ts.description and THERMOCOUPLE.match(ts.description)]
+
+def stack_channels(cell: BatteryData, n_channels=None):
+    """
+    The first n_channels thermocouples of a cell (all by default) as one
+    (n_samples, 1 + n_channels) array of (time, tc1, tc2, ...).
+
+    Channels are put on the first channel's time axis (SNL and TCN channels already share it,
+    others are interpolated). Rows with a NaN in any channel are removed.
+    """
+    series = thermocouples(cell)
+    n_channels = n_channels or len(series)
+    assert len(series) >= n_channels, f'cell {cell.cell_id} has {len(series)} channels, {n_channels} requested'
+    if not series:
+        return np.empty((0, 1), dtype=np.float32)
+
+    time = np.asarray(series[0].time_in_s, dtype=np.float64)
+    temps = []
+    for ts in series[:n_channels]:
+        t = np.asarray(ts.time_in_s, dtype=np.float64)
+        v = np.asarray(ts.temperature_in_C, dtype=np.float64)
+        if len(t) != len(time) or not np.array_equal(t, time, equal_nan=True):
+            ok = ~(np.isnan(t) | np.isnan(v))
+            order = np.argsort(t[ok], kind='stable')
+            v = np.interp(time, t[ok][order], v[ok][order]) if ok.any() else np.full(len(time), np.nan)
+        temps.append(v)
+
+    values = np.column_stack([time] + temps).astype(np.float32)
+    return values[~np.isnan(values).any(axis=1)]
+
+def runaway_onset(values, window_size, rise=ONSET_RISE_C):
+    """
+    Index of the first sample of stack_channels output at which the hottest thermocouple is
+    rise degrees above its starting temperature (median of the first window), or None.
+    """
+    temps = values[:, 1:].max(axis=1)
+    if not len(temps):
+        return None
+    hot = np.flatnonzero(temps >= np.median(temps[:window_size]) + rise)
+    return int(hot[0]) if len(hot) else None
+
+def window_multichannel_cells(cells: List[BatteryData], window_size=config.WINDOW_SIZE, stride=config.STRIDE,
+                              group_by='cell_id', n_channels=None, labels='onset') -> WindowedData:
+    """
+    Like window_cells, but one window per cell and offset with every thermocouple of the cell's
+    array in it: X has shape (n_windows, window_size, 1 + n_channels). Only cells with a
+    thermocouple array (SNL, TCN) are used; n_channels defaults to the smallest array among
+    them (4 when TCN cells are included, 6 for SNL alone) and larger arrays keep their first
+    n_channels. Channels are never padded, a padded cell would only tell its sensor count.
+
+    Parameters:
+    - labels (String): 'onset' labels windows that reach the runaway onset (see runaway_onset)
+      1 and the windows before it 0, so the thermocouple cells supply both classes; 'cell'
+      uses cell.is_healthy, which needs healthy cells with thermocouple arrays
+    """
+    assert labels in ('onset', 'cell'), f'unknown labels {labels}'
+    counts = [len(thermocouples(c)) for c in cells]
+    required = max(2, n_channels or 0)
+    cells = [c for c, n in zip(cells, counts) if n >= required]
+    n_channels = n_channels or min((n for n in counts if n >= required), default=required)
+    X, y, groups, offsets = [], [], [], []
+    for cell in cells:
+        values = stack_channels(cell, n_channels)
+        windows = np.array(sliding_windows(values, window_size, stride))
+        if not len(windows):
+            continue
+        windows[:, :, 0] -= windows[:, :1, 0]
+        offs = np.arange(len(windows)) * stride
+        if labels == 'onset':
+            onset = runaway_onset(values, window_size)
+            # a window is positive once its last sample is at or past the onset
+            y.append(np.zeros(len(windows), dtype=bool) if onset is None else offs + window_size - 1 >= onset)
+        else:
+            y.append(np.full(len(windows), not cell.is_healthy))
+        X.append(windows)
+        groups.append(np.full(len(windows), getattr(cell, group_by), dtype=object))
+        offsets.append(offs)
+    if not X:
+        return WindowedData(np.empty((0, window_size, 1 + n_channels), dtype=np.float32),
+                            np.empty(0, dtype=np.int8), np.empty(0, dtype=object))
+    return WindowedData(np.concatenate(X), np.concatenate(y).astype(np.int8), np.concatenate(groups), np.concatenate(offsets))
+
+def _zscore(a, axis=1):
+    a = a - a.mean(axis=axis, keepdims=True)
+    std = a.std(axis=axis, keepdims=True)
+    return a / np.where(std == 0, 1, std)
+
+def _slope(t, v):
+    """Least-squares slope of v (n, W, ...) against t (n, W) within each window."""
+    t = t - t.mean(axis=1, keepdims=True)
+    denom = np.einsum('nw,nw->n', t, t)
+    denom[denom == 0] = 1
+    v = v - v.mean(axis=1, keepdims=True)
+    return np.einsum('nw,nw...->n...', t, v) / denom.reshape((-1,) + (1,) * (v.ndim - 2))
+
+def _block_features(X, lags, n_bands):
+    time = X[:, :, 0].astype(np.float64)
+    temps = X[:, :, 1:].astype(np.float64)
+    n, W, C = temps.shape
+    i, j = np.triu_indices(C, 1)
+
+    # heating rate of every channel and spatial gradients between every pair of channels
+    rate = _slope(time, temps)
+    diff = temps[:, :, i] - temps[:, :, j]
+    gradients = [rate, diff.mean(axis=1), diff[:, -1], _slope(time, diff)]
+
+    # max-minus-min spread across the channels
+    spread = temps.max(axis=2) - temps.min(axis=2)
+    spread = np.column_stack([spread.mean(axis=1), spread.max(axis=1), spread[:, -1], _slope(time, spread)])
+
+    # correlation of temperature increments between channel pairs, channel i leading channel j by lag
+    steps = np.diff(temps, axis=1)
+    corr = []
+    for lag in (0,) + tuple(l for l in lags if 0 < l < W - 2):
+        a, b = _zscore(steps[:, :W - 1 - lag]), _zscore(steps[:, lag:])
+        m = np.einsum('nti,ntj->nij', a, b) / a.shape[1]
+        corr += [m[:, i, j], m[:, j, i]] if lag else [m[:, i, j]]
+
+    # rFFT band energies of every channel, one FFT over all windows and channels
+    power = np.abs(np.fft.rfft(temps - temps.mean(axis=1, keepdims=True), axis=1)) ** 2
+    edges = np.unique(np.linspace(1, power.shape[1], n_bands + 1).astype(np.int64)[:-1])
+    bands = np.log1p(np.add.reduceat(power, edges, axis=1)).reshape(n, -1)
+
+    return np.hstack(gradients + [spread] + corr + [bands]).astype(np.float32)
+
+def multichannel_features(X, lags=LAGS, n_bands=N_BANDS, block_size=BLOCK_SIZE):
+    """
+    Per-window cross-channel features of X (n_windows, window_size, 1 + n_channels):
+    heating rate per channel, pairwise channel differences (mean, last, slope), spread
+    statistics, lagged pairwise correlations of the increments and log rFFT band energies
+    per channel. Computed in blocks of block_size windows, each block fully vectorized.
+    """
+    X = np.asarray(X)
+    blocks = [_block_features(X[start:start + block_size], lags, n_bands) for start in range(0, len(X), block_size)]
+    if not blocks:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.concatenate(blocks)
+
+def multichannel_matrix(X):
+    """2D matrix for the classical models: channel-mean temperature samples followed by multichannel_features."""
+    return np.hstack([X[:, :, 1:].mean(axis=2, dtype=np.float32), multichannel_features(X)])
@@ -0,0 +1,148 @@
+import numpy as np
+
+# finest stored level groups 2**MIN_LEVEL samples per bucket; finer queries read the raw samples
+MIN_LEVEL = 4
+# stop adding levels once a level has at most this many buckets
+MIN_BUCKETS = 256
+
+def _is_sorted(time):
+    return bool(np.all(time[1:] >= time[:-1]))
+
+def _buckets(time, values, step):
+    """time of the first sample, min, max, NaN-free sum and count of every step samples."""
+    starts = np.arange(0, len(values), step)
+    valid = ~np.isnan(values)
+    return (time[starts], np.fmin.reduceat(values, starts), np.fmax.reduceat(values, starts),
+            np.add.reduceat(np.where(valid, values, 0), starts), np.add.reduceat(valid.astype(np.int64), starts))
+
+def _time_order(time):
+    """
+    (n_valid, order): rows with a NaN time are dropped. When they are all at the end (trailing
+    empty rows of a spreadsheet export) and the rest is sorted, order is None and the valid
+    samples are the first n_valid rows; otherwise order indexes the valid rows in time order.
+    """
+    valid = ~np.isnan(time)
+    n_valid = int(valid.sum())
+    if valid[:n_valid].all() and _is_sorted(time[:n_valid]):
+        return n_valid, None
+    idx = np.flatnonzero(valid)
+    return n_valid, idx[np.argsort(time[idx], kind='stable')]
+
+def _valid_sorted(pyramid, time, values):
+    """Valid samples in time order, without sorting when the pyramid recorded the order."""
+    if pyramid is not None and 'n_valid' in pyramid:
+        n_valid, order = pyramid['n_valid'], pyramid['order']
+    else:
+        n_valid, order = _time_order(time)
+    if order is None:
+        return time[:n_valid], values[:n_valid]
+    return time[order], values[order]
+
+def build_pyramid(time, values, min_level=MIN_LEVEL, min_buckets=MIN_BUCKETS):
+    """
+    Min/max/mean decimation levels of one channel at bucket sizes 2**min_level, 2**(min_level+1), ...
+
+    Each level is a dict of 'time' (time of the bucket's first sample), 'min', 'max' and 'mean'.
+    NaN samples are ignored and rows without a time dropped. Samples are sorted by time first
+    if they are not already; the order is kept in the pyramid so queries never sort again.
+    """
+    time = np.asarray(time, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64)
+    n_valid, order = _time_order(time)
+    pyramid = {'min_level': min_level, 'sorted': order is None, 'n_valid': n_valid, 'order': order}
+    time, values = _valid_sorted(pyramid, time, values)
+
+    levels = []
+    if len(values):
+        t, lo, hi, total, count = _buckets(time, values, 2 ** min_level)
+        while True:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                mean = total / count
+            levels.append({'time': t, 'min': lo.astype(np.float32), 'max': hi.astype(np.float32), 'mean': mean.astype(np.float32)})
+            if len(t) <= min_buckets:
+                break
+            pairs = np.arange(0, len(t), 2)
+            t = t[pairs]
+            lo, hi = np.fmin.reduceat(lo, pairs), np.fmax.reduceat(hi, pairs)
+            total, count = np.add.reduceat(total, pairs), np.add.reduceat(count, pairs)
+    pyramid['levels'] = levels
+    return pyramid
+
+def query_pyramid(pyramid, time, values, t0=None, t1=None, max_points=2000):
+    """
+    Samples of one channel between t0 and t1 at the coarsest power-of-two resolution that
+    keeps at most max_points points (the raw samples when they already fit). Stored levels
+    are used when they are coarse enough; finer levels, and any level of a channel without a
+    pyramid, are bucketed from the raw slice, and levels coarser than the coarsest stored one
+    are merged from it.
+
+    Returns:
+    - dict of 'time', 'min', 'max', 'mean' arrays and the 'level' they came from (0 = raw)
+    """
+    time, values = _valid_sorted(pyramid, np.asarray(time, dtype=np.float64), np.asarray(values, dtype=np.float64))
+    if t0 is None:
+        t0 = time[0] if len(time) else 0.
+    if t1 is None:
+        t1 = time[-1] if len(time) else 0.
+
+    lo, hi = np.searchsorted(time, t0, side='left'), np.searchsorted(time, t1, side='right')
+    n = hi - lo
+    needed = int(np.ceil(np.log2(n / max_points))) if n > max_points else 0
+    levels = pyramid['levels'] if pyramid else []
+    if needed == 0:
+        return {'time': time[lo:hi], 'min': values[lo:hi], 'max': values[lo:hi], 'mean': values[lo:hi], 'level': 0}
+
+    if not levels or needed < pyramid['min_level']:
+        # no stored levels, or finer than them: bucket the raw slice
+        t, mn, mx, total, count = _buckets(time[lo:hi], values[lo:hi], 2 ** needed)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return {'time': t, 'min': mn, 'max': mx, 'mean': total / count, 'level': needed}
+
+    index = min(needed - pyramid['min_level'], len(levels) - 1)
+    level = levels[index]
+    # include the bucket that contains t0
+    b0 = max(np.searchsorted(level['time'], t0, side='right') - 1, 0)
+    b1 = np.searchsorted(level['time'], t1, side='right')
+    out = {k: level[k][b0:b1] for k in ('time', 'min', 'max', 'mean')}
+    extra = needed - pyramid['min_level'] - index
+    if extra > 0:
+        # coarser than the coarsest stored level: merge its buckets 2**extra at a time,
+        # weighting means by bucket size (only the level's last bucket can be partial)
+        size = np.full(b1 - b0, 2 ** (pyramid['min_level'] + index), dtype=np.float64)
+        if b1 == len(level['time']) and 'n_valid' in pyramid:
+            size[-1] = pyramid['n_valid'] - (len(level['time']) - 1) * size[-1]
+        out = _merge_buckets(out, size, 2 ** extra)
+    return {**out, 'level': pyramid['min_level'] + index + extra}
+
+def _merge_buckets(level, size, factor):
+    """Every factor consecutive buckets of a level slice as one; means are weighted by the bucket sizes."""
+    starts = np.arange(0, len(level['time']), factor)
+    if not len(starts):
+        return level
+    weight = np.where(np.isnan(level['mean']), 0, size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.add.reduceat(np.nan_to_num(level['mean'] * weight), starts) / np.add.reduceat(weight, starts)
+    return {
+        'time': level['time'][starts], 'min': np.fmin.reduceat(level['min'], starts),
+        'max': np.fmax.reduceat(level['max'], starts), 'mean': mean.astype(level['mean'].dtype),
+    }
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets downsampling; returns the indices of the kept points."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        nxt_end = edges[i + 2] if i + 2 < len(edges) else n
+        cx, cy = x[end:nxt_end].mean(), y[end:nxt_end].mean()
+        area = np.abs((x[a] - cx) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (cy - y[a]))
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
@@ -0,0 +1,149 @@
+import json
+import numpy as np
+
+from typing import List
+from pathlib import Path
+
+from src.data.battery_data import BatteryData
+from src.data.windowing import get_timeseries, window_timeseries
+
+EMBEDDING_DIM = 32
+META_FIELDS = ['cell_id', 'offset', 'channel', 'organization', 'cathode', 'soc', 'capacity_Ah']
+
+def _object_column(values):
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+def embed_windows(X, dim=EMBEDDING_DIM):
+    """
+    Shape embedding of windows (n, window_size, 2): the temperature channel mean-pooled to dim
+    points and z-normalized, so windows match on the form of the rise rather than its offset.
+    """
+    temp = np.asarray(X, dtype=np.float32)[:, :, 1]
+    edges = np.linspace(0, temp.shape[1], dim + 1).astype(np.int64)[:-1]
+    pooled = np.add.reduceat(temp, edges, axis=1) / np.diff(np.r_[edges, temp.shape[1]])
+    pooled -= pooled.mean(axis=1, keepdims=True)
+    std = pooled.std(axis=1, keepdims=True)
+    return pooled / np.where(std == 0, 1, std)
+
+class WindowIndex:
+    """
+    Exact nearest-neighbour index over window embeddings (or any feature vectors).
+
+    Vectors live in one float32 matrix with precomputed squared norms, so a batch of queries
+    is a single matrix product followed by argpartition. Inserts are appended in chunks and
+    merged on the next search. Metadata (cell, offset, chemistry, SOC, capacity) is kept in
+    column arrays so results can be restricted to, e.g., the same cathode and SOC.
+    """
+    def __init__(self, dim=EMBEDDING_DIM):
+        self.dim = dim
+        self._vectors = np.empty((0, dim), dtype=np.float32)
+        self._norms = np.empty(0, dtype=np.float32)
+        self._pending = []
+        self.meta = {field: np.empty(0, dtype=object) for field in META_FIELDS}
+
+    def __len__(self):
+        return len(self._vectors) + sum(len(v) for v, _ in self._pending)
+
+    def add(self, vectors, meta: dict):
+        """Append vectors (n, dim) with one metadata column per META_FIELDS entry."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        assert vectors.ndim == 2 and vectors.shape[1] == self.dim, f'expected vectors of shape (n, {self.dim})'
+        columns = {}
+        for field in META_FIELDS:
+            column = np.asarray(meta.get(field), dtype=object)
+            columns[field] = np.broadcast_to(column, len(vectors)).copy() if column.ndim == 0 else column
+            assert len(columns[field]) == len(vectors), f'metadata column {field} has the wrong length'
+        self._pending.append((vectors, columns))
+        return self
+
+    def add_cells(self, cells: List[BatteryData], window_size=None, stride=10, runaway_only=True):
+        """Window and embed every timeseries of the given cells, tagging each window with the cell's metadata."""
+        kwargs = {'window_size': window_size} if window_size else {}
+        for cell in cells:
+            if runaway_only and cell.is_healthy:
+                continue
+            for channel, ts in enumerate(get_timeseries(cell)):
+                windows, offsets = window_timeseries(ts, stride=stride, **kwargs)
+                if not len(windows):
+                    continue
+                self.add(embed_windows(windows, self.dim), {
+                    'cell_id': cell.cell_id,
+                    'offset': offsets.tolist(),
+                    'channel': ts.description or channel,
+                    'organization': cell.organization,
+                    'cathode': cell.cathode_material,
+                    'soc': cell.state_of_charge,
+                    'capacity_Ah': cell.nominal_capacity_in_Ah,
+                })
+        return self
+
+    def _consolidate(self):
+        if not self._pending:
+            return
+        self._vectors = np.concatenate([self._vectors] + [v for v, _ in self._pending])
+        self._norms = np.einsum('ij,ij->i', self._vectors, self._vectors)
+        for field in META_FIELDS:
+            self.meta[field] = np.concatenate([self.meta[field]] + [m[field] for _, m in self._pending])
+        self._pending = []
+
+    def _mask(self, filters):
+        mask = np.ones(len(self._vectors), dtype=bool)
+        for field, value in (filters or {}).items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            mask &= np.isin(self.meta[field], list(values))
+        return mask
+
+    def search(self, queries, k=5, **filters):
+        """
+        Top-k nearest stored windows for each query vector, by Euclidean distance.
+        Keyword filters restrict candidates on metadata, e.g. search(q, cathode='LFP', soc=[80, 100]).
+
+        Returns:
+        - list (one per query) of lists of dicts: metadata plus 'distance'
+        """
+        self._consolidate()
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        candidates = np.flatnonzero(self._mask(filters)) if filters else None
+        vectors = self._vectors if candidates is None else self._vectors[candidates]
+        norms = self._norms if candidates is None else self._norms[candidates]
+        if not len(vectors):
+            return [[] for _ in queries]
+
+        k = min(k, len(vectors))
+        dist = norms[None, :] - 2 * queries @ vectors.T + np.einsum('ij,ij->i', queries, queries)[:, None]
+        top = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        top = np.take_along_axis(top, np.argsort(np.take_along_axis(dist, top, axis=1), axis=1), axis=1)
+
+        results = []
+        for q, row in enumerate(top):
+            ids = row if candidates is None else candidates[row]
+            results.append([
+                {**{field: self.meta[field][i] for field in META_FIELDS}, 'distance': float(np.sqrt(max(dist[q, j], 0)))}
+                for i, j in zip(ids, row)
+            ])
+        return results
+
+    def search_windows(self, X, k=5, **filters):
+        """search() on raw windows (n, window_size, 2), embedded the same way as the index."""
+        return self.search(embed_windows(X, self.dim), k, **filters)
+
+    def save(self, path):
+        """Vectors to <path>.npy, metadata to <path>.json."""
+        self._consolidate()
+        path = Path(path)
+        np.save(path.with_suffix('.npy'), self._vectors)
+        with open(path.with_suffix('.json'), 'w') as f:
+            json.dump({'dim': self.dim, 'meta': {k: v.tolist() for k, v in self.meta.items()}}, f, default=str)
+
+    @staticmethod
+    def load(path, mmap=False):
+        path = Path(path)
+        with open(path.with_suffix('.json')) as f:
+            obj = json.load(f)
+        index = WindowIndex(obj['dim'])
+        index._vectors = np.load(path.with_suffix('.npy'), mmap_mode='r' if mmap else None)
+        index._norms = np.einsum('ij,ij->i', index._vectors, index._vectors)
+        index.meta = {k: _object_column(v) for k, v in obj['meta'].items()}
+        return index
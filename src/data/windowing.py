@@ -0,0 +1,99 @@
+import numpy as np
+
+from typing import List
+from src.config import config
+from src.data.battery_data import BatteryData, TimeseriesData
+
+class WindowedData:
+    """
+    Fixed-size windows cut from a set of cells.
+
+    X has shape (n_windows, window_size, 2) holding (time since window start, temperature),
+    y is 1 for runaway windows and 0 for healthy ones, groups holds the key each window
+    belongs to (cell_id by default) so that validation can keep a cell inside one fold.
+    """
+    def __init__(self, X, y, groups, offsets=None):
+        self.X = X
+        self.y = y
+        self.groups = groups
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.y)
+
+    def subset(self, idx):
+        return WindowedData(
+            self.X[idx], self.y[idx], self.groups[idx],
+            offsets=None if self.offsets is None else self.offsets[idx]
+        )
+
+def get_timeseries(cell: BatteryData) -> List[TimeseriesData]:
+    ts = getattr(cell, 'timeseries_data', None)
+    if ts is None:
+        return []
+    return ts if isinstance(ts, list) else [ts]
+
+def sliding_windows(values, window_size=config.WINDOW_SIZE, stride=config.STRIDE):
+    """Strided view of shape (n_windows, window_size, *values.shape[1:]) over the first axis."""
+    values = np.asarray(values, dtype=np.float32)
+    if len(values) < window_size:
+        return np.empty((0, window_size) + values.shape[1:], dtype=np.float32)
+    view = np.lib.stride_tricks.sliding_window_view(values, window_size, axis=0)[::stride]
+    # sliding_window_view puts the window axis last
+    return np.moveaxis(view, -1, 1) if values.ndim > 1 else view
+
+def window_timeseries(ts: TimeseriesData, window_size=config.WINDOW_SIZE, stride=config.STRIDE):
+    values = np.column_stack([
+        np.asarray(ts.time_in_s, dtype=np.float32),
+        np.asarray(ts.temperature_in_C, dtype=np.float32)
+    ])
+    values = values[~np.isnan(values).any(axis=1)]
+    windows = np.array(sliding_windows(values, window_size, stride))
+    if len(windows):
+        windows[:, :, 0] -= windows[:, :1, 0]
+    offsets = np.arange(len(windows)) * stride
+    return windows, offsets
+
+def window_cells(cells: List[BatteryData], window_size=config.WINDOW_SIZE, stride=config.STRIDE, group_by='cell_id') -> WindowedData:
+    """
+    Window every timeseries of every cell.
+
+    Parameters:
+    - cells (List[BatteryData])
+    - group_by (String): BatteryData attribute used as the CV group, e.g. 'cell_id' or 'organization'
+    """
+    X, y, groups, offsets = [], [], [], []
+    for cell in cells:
+        for ts in get_timeseries(cell):
+            windows, offs = window_timeseries(ts, window_size, stride)
+            X.append(windows)
+            y.append(np.full(len(windows), 0 if cell.is_healthy else 1, dtype=np.int8))
+            groups.append(np.full(len(windows), getattr(cell, group_by), dtype=object))
+            offsets.append(offs)
+    if not X:
+        return WindowedData(np.empty((0, window_size, 2), dtype=np.float32), np.empty(0, dtype=np.int8), np.empty(0, dtype=object))
+    return WindowedData(np.concatenate(X), np.concatenate(y), np.concatenate(groups), np.concatenate(offsets))
+
+def classical_features(X):
+    """2D matrix for the classical models: the temperature channel of each window, one column per sample."""
+    return np.ascontiguousarray(X[:, :, 1])
+
+def split_by_group(data: WindowedData, test_size=0.2, random_state=42):
+    """Train/test split that keeps every group (cell) on one side, stratified on the group label."""
+    from sklearn.model_selection import train_test_split
+
+    groups, first = np.unique(data.groups, return_index=True)
+    labels = data.y[first]
+    stratify = labels if np.bincount(labels).min() >= 2 else None
+    _, test_groups = train_test_split(groups, test_size=test_size, random_state=random_state, stratify=stratify)
+    is_test = np.isin(data.groups, test_groups)
+    return data.subset(~is_test), data.subset(is_test)
+
+def add_scaled_features(train: WindowedData, test: WindowedData, features=classical_features):
+    """Set X_scaled on both sets: features(X) standardized with the train statistics."""
+    train_features, test_features = features(train.X), features(test.X)
+    mean, std = train_features.mean(axis=0), train_features.std(axis=0)
+    std[std == 0] = 1
+    train.X_scaled = (train_features - mean) / std
+    test.X_scaled = (test_features - mean) / std
+    return train, test
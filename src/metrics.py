@@ -0,0 +1,105 @@
+import numpy as np
+
+class BinaryMetrics:
+    """
+    ROC, PR, AUC and confusion matrices for one model's scores.
+
+    Scores are sorted once; every curve and every confusion matrix is then read off the
+    cumulative true/false positive counts at the distinct score values, following the
+    conventions of sklearn.metrics (a sample is predicted positive when score >= threshold).
+    """
+    def __init__(self, y_true, y_score):
+        y_true = np.asarray(y_true).ravel().astype(bool)
+        y_score = np.asarray(y_score, dtype=np.float64).ravel()
+        assert len(y_true) == len(y_score), 'y_true and y_score have different lengths'
+
+        order = np.argsort(y_score, kind='mergesort')[::-1]
+        self.sorted_scores = y_score[order]
+        # cum_tps[k] is the number of positives among the k highest scores
+        self.cum_tps = np.r_[0, np.cumsum(y_true[order])]
+
+        last_of_run = np.r_[np.flatnonzero(np.diff(self.sorted_scores)), len(y_score) - 1]
+        self.tps = self.cum_tps[last_of_run + 1]
+        self.fps = last_of_run + 1 - self.tps
+        self.thresholds = self.sorted_scores[last_of_run]
+        self.n_pos = int(self.cum_tps[-1])
+        self.n_neg = len(y_score) - self.n_pos
+
+        self._auc = None
+
+    def roc_curve(self, drop_intermediate=True):
+        """fpr, tpr, thresholds as returned by sklearn.metrics.roc_curve."""
+        tps, fps, thresholds = self.tps, self.fps, self.thresholds
+        if drop_intermediate and len(fps) > 2:
+            keep = np.flatnonzero(np.r_[True, np.logical_or(np.diff(fps, 2), np.diff(tps, 2)), True])
+            tps, fps, thresholds = tps[keep], fps[keep], thresholds[keep]
+        tps = np.r_[0, tps]
+        fps = np.r_[0, fps]
+        thresholds = np.r_[np.inf, thresholds]
+        fpr = fps / self.n_neg if self.n_neg else np.full(fps.shape, np.nan)
+        tpr = tps / self.n_pos if self.n_pos else np.full(tps.shape, np.nan)
+        return fpr, tpr, thresholds
+
+    @property
+    def auc(self):
+        if self._auc is None:
+            fpr, tpr, _ = self.roc_curve(drop_intermediate=False)
+            self._auc = float(np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2))
+        return self._auc
+
+    def pr_curve(self):
+        """precision, recall, thresholds as returned by sklearn.metrics.precision_recall_curve."""
+        precision = self.tps / (self.tps + self.fps)
+        recall = self.tps / self.n_pos if self.n_pos else np.ones(self.tps.shape)
+        return np.r_[precision[::-1], 1], np.r_[recall[::-1], 0], self.thresholds[::-1]
+
+    @property
+    def average_precision(self):
+        precision, recall, _ = self.pr_curve()
+        return float(-np.sum(np.diff(recall) * precision[:-1]))
+
+    def confusion_matrix(self, thresholds=0.5):
+        """
+        Confusion matrices [[tn, fp], [fn, tp]] at each threshold, shape (2, 2) for a scalar
+        threshold and (k, 2, 2) for k thresholds.
+        """
+        t = np.asarray(thresholds, dtype=np.float64)
+        n_pred_pos = len(self.sorted_scores) - np.searchsorted(self.sorted_scores[::-1], t.ravel(), side='left')
+        tp = self.cum_tps[n_pred_pos]
+        fp = n_pred_pos - tp
+        fn = self.n_pos - tp
+        tn = self.n_neg - fp
+        cms = np.stack([np.stack([tn, fp], -1), np.stack([fn, tp], -1)], -2)
+        return cms[0] if t.ndim == 0 else cms
+
+def label_confusion_matrix(y_true, y_pred):
+    """2x2 confusion matrix [[tn, fp], [fn, tp]] for binary labels, in one bincount."""
+    y_true = np.asarray(y_true).ravel().astype(np.int64) != 0
+    y_pred = np.asarray(y_pred).ravel().astype(np.int64) != 0
+    return np.bincount(2 * y_true + y_pred, minlength=4).reshape(2, 2)
+
+class MetricsCache:
+    """
+    BinaryMetrics per model name. An entry is reused as long as it is asked for with the
+    same y_true/y_score objects, which is how classify and the plotting functions share it
+    through the roc_curves dict.
+    """
+    def __init__(self):
+        self._entries = {}
+
+    def get(self, name, y_true, y_score) -> BinaryMetrics:
+        entry = self._entries.get(name)
+        if entry is not None and entry[0] is y_true and entry[1] is y_score:
+            return entry[2]
+        metrics = BinaryMetrics(y_true, y_score)
+        self._entries[name] = (y_true, y_score, metrics)
+        return metrics
+
+    def discard(self, name):
+        """Release the entry of name, if any."""
+        self._entries.pop(name, None)
+
+    def clear(self):
+        self._entries.clear()
+
+METRICS = MetricsCache()
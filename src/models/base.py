@@ -3,9 +3,9 @@
 
 import abc
 import torch
-import shutil
 
-from batteryml.data.databundle import DataBundle
+from src.data.databundle import DataBundle
+from src.models.checkpoint import CheckpointManager, link_latest
 
 
 class BaseModel(abc.ABC):
@@ -34,10 +34,22 @@ class BaseModel(abc.ABC):
     def load_checkpoint(self, path: str):
         """Load checkpoint from disk."""
 
+    def checkpoint_state(self):
+        """State to checkpoint in the background, e.g. {'model': self.model.state_dict()}.
+
+        Models that return a state here must read the same torch.save'd object back in
+        load_checkpoint. The default (None) makes CheckpointManager call dump_checkpoint.
+        """
+        return None
+
+    def checkpoint_manager(self, keep_last: int = 3, background: bool = True) -> CheckpointManager:
+        """CheckpointManager writing to the workspace."""
+        assert self.workspace is not None, 'model has no workspace to checkpoint to'
+        return CheckpointManager(self.workspace, keep_last=keep_last, background=background)
+
     def to(self, device: str):
         """Move the model to the device."""
         return self
 
     def link_latest_checkpoint(self, filename: str):
-        to_dump = self.workspace / 'latest.ckpt'
-        shutil.copyfile(filename, to_dump)
+        link_latest(filename, self.workspace)
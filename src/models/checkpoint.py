@@ -0,0 +1,130 @@
+import os
+import copy
+import torch
+import shutil
+
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+LATEST = 'latest.ckpt'
+
+def snapshot_state(state):
+    """Copy of a (nested) state dict with every tensor detached and copied to the CPU."""
+    if isinstance(state, torch.Tensor):
+        return state.detach().to('cpu', copy=True)
+    if isinstance(state, dict):
+        return type(state)((k, snapshot_state(v)) for k, v in state.items())
+    if isinstance(state, (list, tuple)):
+        return type(state)(snapshot_state(v) for v in state)
+    return copy.deepcopy(state)
+
+def link_latest(path, workspace=None):
+    """
+    Point <workspace>/latest.ckpt at path: a relative symlink, a hardlink where symlinks
+    are not available, a copy as a last resort. The link is created next to the old one
+    and renamed over it, so readers never see a missing latest.ckpt.
+    """
+    path = Path(path)
+    workspace = Path(workspace or path.parent)
+    latest = workspace / LATEST
+    tmp = workspace / f'.{LATEST}.{os.getpid()}.tmp'
+    if tmp.exists() or tmp.is_symlink():
+        tmp.unlink()
+    try:
+        os.symlink(os.path.relpath(path, workspace), tmp)
+    except (OSError, NotImplementedError):
+        try:
+            os.link(path, tmp)
+        except OSError:
+            shutil.copyfile(path, tmp)
+    os.replace(tmp, latest)
+    return latest
+
+class CheckpointManager:
+    """
+    Background, atomic checkpoint writer for BaseModel implementations.
+
+    save() snapshots model.checkpoint_state() to the CPU on the calling thread and returns;
+    a single writer thread saves it to a temp file, fsyncs and renames it into place,
+    repoints latest.ckpt and removes all but the keep_last newest checkpoints. Writes happen
+    in save() order. Models without a checkpoint_state() are written with their own
+    dump_checkpoint(), still through a temp file, but on the calling thread.
+
+    Errors from a background write are raised by the next save(), wait() or close().
+    """
+    def __init__(self, workspace, keep_last: int = 3, background: bool = True):
+        self.workspace = Path(workspace)
+        self.keep_last = keep_last
+        self._pool = ThreadPoolExecutor(max_workers=1) if background else None
+        self._pending = []
+        self._history = sorted(
+            (p for p in self.workspace.glob('*.ckpt') if p.name != LATEST and not p.is_symlink()),
+            key=lambda p: p.stat().st_mtime,
+        )
+
+    def path(self, name: str) -> Path:
+        return self.workspace / f'{name}.ckpt'
+
+    def _tmp(self, path):
+        return path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+
+    def _commit(self, tmp, path):
+        os.replace(tmp, path)
+        link_latest(path, self.workspace)
+        if path in self._history:
+            self._history.remove(path)
+        self._history.append(path)
+        while self.keep_last and len(self._history) > self.keep_last:
+            old = self._history.pop(0)
+            if old.exists():
+                old.unlink()
+        return path
+
+    def _write(self, state, path):
+        tmp = self._tmp(path)
+        with open(tmp, 'wb') as fout:
+            torch.save(state, fout)
+            fout.flush()
+            os.fsync(fout.fileno())
+        return self._commit(tmp, path)
+
+    def _raise_failed(self):
+        done = [f for f in self._pending if f.done()]
+        self._pending = [f for f in self._pending if not f.done()]
+        for future in done:
+            future.result()
+
+    def save(self, model, name: str):
+        """Checkpoint model as <workspace>/<name>.ckpt; returns the path (written in the background)."""
+        os.makedirs(self.workspace, exist_ok=True)
+        self._raise_failed()
+        path = self.path(name)
+        state = model.checkpoint_state()
+        if state is None:
+            self.wait()
+            tmp = self._tmp(path)
+            model.dump_checkpoint(tmp)
+            return self._commit(tmp, path)
+
+        state = snapshot_state(state)
+        if self._pool is None:
+            return self._write(state, path)
+        self._pending.append(self._pool.submit(self._write, state, path))
+        return path
+
+    def wait(self):
+        """Block until every queued checkpoint is on disk."""
+        pending, self._pending = self._pending, []
+        for future in pending:
+            future.result()
+
+    def close(self):
+        self.wait()
+        if self._pool is not None:
+            self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
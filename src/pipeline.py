@@ -0,0 +1,214 @@
+"""
+Declarative experiment pipeline.
+
+A YAML spec (see configs/experiment.yaml) is turned into a DAG of stages:
+
+    preprocess -> windows -> search:<model> ... -> ensemble:<name> ... -> report
+
+Every stage's output is cached under a key hashed from its own config and the keys of the
+stages it depends on, so editing one model's grid only reruns that model's search and
+the stages downstream of it. Independent stages (the model searches) run in parallel.
+
+    python -m src.runner experiment configs/experiment.yaml
+"""
+import os
+import json
+import pickle
+import hashlib
+
+from glob import glob
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from src.config import config
+from src.utils.config import YamlHandler, addict2dict
+from src.utils.profiler import PROFILER
+
+# bump to invalidate every cached stage output
+PIPELINE_VERSION = 1
+
+def _digest(obj) -> str:
+    return hashlib.sha1(json.dumps(obj, sort_keys=True, default=str).encode()).hexdigest()
+
+class Stage:
+    def __init__(self, name, fn, config=None, deps=(), cache=True):
+        """
+        Parameters:
+        - fn: called as fn(config, *outputs_of_deps)
+        - cache (bool): uncached stages always run; their output is hashed instead of their config
+        """
+        self.name = name
+        self.fn = fn
+        self.config = config
+        self.deps = list(deps)
+        self.cache = cache
+
+class Pipeline:
+    def __init__(self, cache_dir=None, n_jobs=1, silent=False):
+        self.cache_dir = Path(cache_dir or f'{config.RESULTS_DIR}/cache/')
+        self.n_jobs = n_jobs
+        self.silent = silent
+        self.stages = {}
+
+    def add(self, name, fn, config=None, deps=(), cache=True):
+        assert name not in self.stages, f'stage {name} is already defined'
+        for dep in deps:
+            assert dep in self.stages, f'stage {name} depends on unknown stage {dep}'
+        self.stages[name] = Stage(name, fn, config, deps, cache)
+        return self
+
+    def _cache_path(self, name, key):
+        return self.cache_dir / f"{name.replace(':', '-')}-{key}.pkl"
+
+    def _run_stage(self, stage, deps):
+        """deps: list of (key, output) of the dependencies; returns (key, output, cached)."""
+        if not stage.cache:
+            with PROFILER.stage('pipeline_stage', stage=stage.name, cached=False):
+                output = stage.fn(stage.config, *[out for _, out in deps])
+            return _digest([PIPELINE_VERSION, stage.name, output]), output, False
+
+        key = _digest([PIPELINE_VERSION, stage.name, stage.config, [k for k, _ in deps]])
+        path = self._cache_path(stage.name, key)
+        if path.exists():
+            with open(path, 'rb') as fin:
+                return key, pickle.load(fin), True
+
+        with PROFILER.stage('pipeline_stage', stage=stage.name, cached=False):
+            output = stage.fn(stage.config, *[out for _, out in deps])
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp, 'wb') as fout:
+            pickle.dump(output, fout)
+        os.replace(tmp, path)
+        return key, output, False
+
+    def run(self):
+        """Run every stage whose inputs changed; returns {stage name: output}."""
+        done, running = {}, {}
+        pending = dict(self.stages)
+        with ThreadPoolExecutor(max_workers=self.n_jobs) as pool:
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    if all(dep in done for dep in stage.deps):
+                        deps = [done[dep] for dep in stage.deps]
+                        running[pool.submit(self._run_stage, stage, deps)] = name
+                        del pending[name]
+                assert running, f'stages {list(pending)} can never run, check for a dependency cycle'
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    key, output, cached = future.result()
+                    done[name] = (key, output)
+                    if not self.silent:
+                        print(f"{'cached' if cached else 'ran':>6}  {name}")
+        return {name: output for name, (_, output) in done.items()}
+
+# Stage functions
+
+def preprocess_stage(cfg):
+    """Run the preprocessors (already processed cells are skipped) and fingerprint the result."""
+    from src.preprocessing import SUPPORTED_SOURCES
+    from src.runner import preprocess
+
+    orgs = cfg.get('preprocess')
+    processed_dir = cfg.get('processed_dir', config.PROCESSED_DATA_DIR)
+    if orgs:
+        # write where the cells are read from, not to the default PROCESSED_DATA_DIR
+        preprocess(orgs_to_skip=[org for org in SUPPORTED_SOURCES['DATASETS'] if org not in orgs], silent=True,
+                   output_dir=processed_dir)
+    files = sorted(glob(os.path.join(processed_dir, '**', '*.pkl'), recursive=True))
+    return [(f, os.path.getsize(f), os.path.getmtime(f)) for f in files]
+
+def windows_stage(cfg, files):
+    import numpy as np
+    from src.data.battery_data import BatteryData
+    from src.data.windowing import window_cells, split_by_group, add_scaled_features, classical_features
+    from src.data.multichannel import window_multichannel_cells, multichannel_matrix
+
+    features = cfg.get('features', 'classical')
+    assert features in ('classical', 'multichannel'), f'unknown feature set {features}'
+    organizations = cfg['datasets'].get('organizations')
+    cells = [BatteryData.load(f) for f, _, _ in files]
+    cells = [c for c in cells if not organizations or c.organization in organizations]
+    window = cfg['window']
+    kwargs = dict(window_size=window.get('size', config.WINDOW_SIZE), stride=window.get('stride', config.STRIDE),
+                  group_by=window.get('group_by', 'cell_id'))
+    if features == 'multichannel':
+        data = window_multichannel_cells(cells, n_channels=window.get('channels'), labels=window.get('labels', 'onset'), **kwargs)
+    else:
+        data = window_cells(cells, **kwargs)
+    assert len(np.unique(data.y)) == 2, f'{features} windows of the selected cells do not cover both classes'
+    split = cfg.get('split', {})
+    train, test = split_by_group(data, split.get('test_size', 0.2), split.get('random_state', 42))
+    return add_scaled_features(train, test, multichannel_matrix if features == 'multichannel' else classical_features)
+
+def _classify_result(classify, *args, **kwargs):
+    cm, roc, train_auc, test_auc, params, ci = {}, {}, {}, {}, {}, {}
+    df = classify(*args, cm, roc, train_auc, test_auc, params, ci, **kwargs)
+    name = df['model'].iloc[0]
+    return {
+        'summary': df, 'confusion_matrix': cm[name], 'roc_curve': roc[name], 'train_auc': train_auc[name],
+        'test_auc': test_auc[name], 'best_params': params.get(name), 'auc_ci': ci[name],
+    }
+
+def search_stage(cfg, data):
+    import src.classifiers.classical as classical
+
+    train, test = data
+    return _classify_result(classical.classify, cfg['model'], train, test, grid=cfg.get('grid'),
+                            n_splits=cfg.get('n_splits'), distributed=cfg.get('distributed'))
+
+def ensemble_stage(cfg, data, *searches):
+    import src.classifiers.ensemble as ensemble
+
+    train, test = data
+    return _classify_result(ensemble.classify, cfg['models'], cfg['ensemble'], train, test)
+
+def report_stage(cfg, *results):
+    import pandas as pd
+    from src.plotting import save_all_confusion_matrices, save_all_roc_curves, save_all_pr_curves, save_auc_comparison
+
+    out = cfg.get('dir', config.RESULTS_DIR)
+    os.makedirs(out, exist_ok=True)
+    names = [r['summary']['model'].iloc[0] for r in results]
+    summary_path = os.path.join(out, 'summary_metrics.csv')
+    pd.concat([r['summary'] for r in results]).to_csv(summary_path, index=False)
+    if cfg.get('plots', True):
+        save_all_confusion_matrices({n: r['confusion_matrix'] for n, r in zip(names, results)}, dir=out)
+        roc = {n: r['roc_curve'] for n, r in zip(names, results)}
+        save_all_roc_curves(roc, dir=out)
+        save_all_pr_curves(roc, dir=out)
+        save_auc_comparison({n: r['train_auc'] for n, r in zip(names, results)},
+                            {n: r['test_auc'] for n, r in zip(names, results)}, dir=out,
+                            auc_ci={n: r['auc_ci'] for n, r in zip(names, results)})
+    return summary_path
+
+def build_pipeline(spec: dict, silent=False) -> Pipeline:
+    """Turn an experiment spec (dict, e.g. read from YAML) into a Pipeline."""
+    pipeline = Pipeline(cache_dir=spec.get('cache_dir'), n_jobs=spec.get('n_jobs', 1), silent=silent)
+    datasets = spec.get('datasets', {})
+    pipeline.add('preprocess', preprocess_stage, datasets, cache=False)
+    pipeline.add('windows', windows_stage, {
+        'datasets': datasets, 'window': spec.get('window', {}), 'split': spec.get('split', {}),
+        'features': spec.get('features', 'classical'),
+    }, deps=['preprocess'])
+
+    models = spec.get('models') or {}
+    for model, grid in models.items():
+        search = {'model': model, 'grid': grid, 'n_splits': (spec.get('cv') or {}).get('n_splits')}
+        if spec.get('distributed') is not None:
+            search['distributed'] = spec['distributed']
+        pipeline.add(f'search:{model}', search_stage, search, deps=['windows'])
+
+    searches = [f'search:{m}' for m in models]
+    for name in spec.get('ensembles') or []:
+        pipeline.add(f'ensemble:{name}', ensemble_stage, {'ensemble': name, 'models': list(models)},
+                     deps=['windows'] + searches)
+
+    results = searches + [f'ensemble:{n}' for n in spec.get('ensembles') or []]
+    pipeline.add('report', report_stage, spec.get('outputs', {}), deps=results)
+    return pipeline
+
+def run_experiment(spec_path, silent=False):
+    spec = addict2dict(YamlHandler(spec_path).read_yaml())
+    return build_pipeline(spec, silent=silent).run()
@@ -1,11 +1,17 @@
 
 import numpy as np
-import seaborn as sns
-import matplotlib.pyplot as plt
-from sklearn.metrics import confusion_matrix, classification_report, roc_auc_score, roc_curve, auc
+from src.metrics import METRICS
+from src.utils.profiler import profiled
+from src.data.pyramid import lttb
+
+# matplotlib/seaborn are imported inside each function so that importing this
+# module (e.g. `from src.plotting import *` in the notebook) stays cheap.
 
 #Saving
+@profiled()
 def save_all_confusion_matrices(conf_mats, dir='./results'):
+    import seaborn as sns
+    import matplotlib.pyplot as plt
     _, axs = plt.subplots(3, 3, figsize=(18, 15))
     axs = axs.flatten()
     for ax, (name, cm) in zip(axs, conf_mats.items()):
@@ -17,12 +23,14 @@ def save_all_confusion_matrices(conf_mats, dir='./results'):
     plt.savefig('{}/all_confusion_matrices.png'.format(dir))
     plt.close()
 
+@profiled()
 def save_all_roc_curves(roc_data, dir='./results'):
+    import matplotlib.pyplot as plt
     _, ax = plt.subplots(figsize=(10, 8))
     for name, (y_true, y_prob) in sorted(roc_data.items()):
-        fpr, tpr, _ = roc_curve(y_true, y_prob)
-        auc_val = auc(fpr, tpr)
-        ax.plot(fpr, tpr, label=f"{name} (AUC={auc_val:.3f})")
+        m = METRICS.get(name, y_true, y_prob)
+        fpr, tpr, _ = m.roc_curve()
+        ax.plot(fpr, tpr, label=f"{name} (AUC={m.auc:.3f})")
     ax.plot([0, 1], [0, 1], '--', color='gray')
     ax.set_title("ROC Curves")
     ax.set_xlabel("False Positive Rate")
@@ -32,13 +40,42 @@ def save_all_roc_curves(roc_data, dir='./results'):
     plt.savefig('{}/all_roc_curves_sorted.png'.format(dir))
     plt.close()
 
-def save_auc_comparison(train_aucs, test_aucs, dir='./results'):
+@profiled()
+def save_all_pr_curves(roc_data, dir='./results'):
+    import matplotlib.pyplot as plt
+    _, ax = plt.subplots(figsize=(10, 8))
+    for name, (y_true, y_prob) in sorted(roc_data.items()):
+        m = METRICS.get(name, y_true, y_prob)
+        precision, recall, _ = m.pr_curve()
+        ax.step(recall, precision, where='post', label=f"{name} (AP={m.average_precision:.3f})")
+    ax.set_title("Precision-Recall Curves")
+    ax.set_xlabel("Recall")
+    ax.set_ylabel("Precision")
+    ax.legend()
+    plt.tight_layout()
+    plt.savefig('{}/all_pr_curves.png'.format(dir))
+    plt.close()
+
+def _ci_errors(aucs, cis, labels, which):
+    """
+    Asymmetric error bars from auc_ci entries (train_ci, test_ci) filled by classify. A
+    percentile interval may exclude the point estimate (or do so by rounding), so both arms
+    are clipped at 0.
+    """
+    if not cis:
+        return None
+    errors = np.array([[aucs[l] - cis[l][which][0], cis[l][which][1] - aucs[l]] for l in labels]).T
+    return np.maximum(errors, 0)
+
+@profiled()
+def save_auc_comparison(train_aucs, test_aucs, dir='./results', auc_ci=None):
+    import matplotlib.pyplot as plt
     labels = list(train_aucs.keys())
     x = np.arange(len(labels))
     width = 0.35
     plt.figure(figsize=(10,6))
-    plt.bar(x - width/2, [train_aucs[l] for l in labels], width, label="Train AUC")
-    plt.bar(x + width/2, [test_aucs[l] for l in labels], width, label="Test AUC")
+    plt.bar(x - width/2, [train_aucs[l] for l in labels], width, label="Train AUC", yerr=_ci_errors(train_aucs, auc_ci, labels, 0), capsize=4)
+    plt.bar(x + width/2, [test_aucs[l] for l in labels], width, label="Test AUC", yerr=_ci_errors(test_aucs, auc_ci, labels, 1), capsize=4)
     plt.xticks(x, labels, rotation=45)
     plt.ylabel("AUC")
     plt.title("Train vs Test AUC Comparison")
@@ -48,7 +85,10 @@ def save_auc_comparison(train_aucs, test_aucs, dir='./results'):
     plt.close()
 
 # Plotting
+@profiled()
 def plot_confusion_matrices(confusion_matrices):
+    import seaborn as sns
+    import matplotlib.pyplot as plt
     fig, axs = plt.subplots(3, 3, figsize=(18, 15))
     axs = axs.flatten()
     for ax, (name, cm) in zip(axs, confusion_matrices.items()):
@@ -61,13 +101,14 @@ def plot_confusion_matrices(confusion_matrices):
     plt.tight_layout()
     plt.show()
 
+@profiled()
 def plot_roc_curves(roc_curves):
+    import matplotlib.pyplot as plt
     fig, ax = plt.subplots(figsize=(10, 8))
-    sorted_roc = sorted(roc_curves.items(), key=lambda x: auc(*roc_curve(x[1][0], x[1][1])[:2]), reverse=True)
-    for name, (y_true, y_prob) in sorted_roc:
-        fpr, tpr, _ = roc_curve(y_true, y_prob)
-        auc_val = auc(fpr, tpr)
-        ax.plot(fpr, tpr, label=f"{name} (AUC={auc_val:.3f})")
+    metrics = {name: METRICS.get(name, y_true, y_prob) for name, (y_true, y_prob) in roc_curves.items()}
+    for name, m in sorted(metrics.items(), key=lambda x: x[1].auc, reverse=True):
+        fpr, tpr, _ = m.roc_curve()
+        ax.plot(fpr, tpr, label=f"{name} (AUC={m.auc:.3f})")
     ax.plot([0, 1], [0, 1], '--', color='gray')
     ax.set_title("ROC Curves (Sorted by AUC)")
     ax.set_xlabel("False Positive Rate")
@@ -76,16 +117,56 @@ def plot_roc_curves(roc_curves):
     plt.tight_layout()
     plt.show()
 
-def auc_comparison(train_auc, test_auc):
+@profiled()
+def plot_pr_curves(roc_curves):
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(10, 8))
+    metrics = {name: METRICS.get(name, y_true, y_prob) for name, (y_true, y_prob) in roc_curves.items()}
+    for name, m in sorted(metrics.items(), key=lambda x: x[1].average_precision, reverse=True):
+        precision, recall, _ = m.pr_curve()
+        ax.step(recall, precision, where='post', label=f"{name} (AP={m.average_precision:.3f})")
+    ax.set_title("Precision-Recall Curves (Sorted by AP)")
+    ax.set_xlabel("Recall")
+    ax.set_ylabel("Precision")
+    ax.legend()
+    plt.tight_layout()
+    plt.show()
+
+@profiled()
+def auc_comparison(train_auc, test_auc, auc_ci=None):
+    import matplotlib.pyplot as plt
     labels = list(train_auc.keys())
     x = np.arange(len(labels))
     width = 0.35
     plt.figure(figsize=(10,6))
-    plt.bar(x - width/2, [train_auc[k] for k in labels], width, label="Train AUC")
-    plt.bar(x + width/2, [test_auc[k] for k in labels], width, label="Test AUC")
+    plt.bar(x - width/2, [train_auc[k] for k in labels], width, label="Train AUC", yerr=_ci_errors(train_auc, auc_ci, labels, 0), capsize=4)
+    plt.bar(x + width/2, [test_auc[k] for k in labels], width, label="Test AUC", yerr=_ci_errors(test_auc, auc_ci, labels, 1), capsize=4)
     plt.xticks(x, labels, rotation=45)
     plt.ylabel("AUC")
     plt.title("Train vs Test AUC Comparison")
     plt.legend()
     plt.tight_layout()
-    plt.show()
\ No newline at end of file
+    plt.show()
+
+@profiled()
+def plot_timeseries(battery, t0=None, t1=None, max_points=2000):
+    """
+    Temperature of every timeseries of a cell between t0 and t1: the min/max envelope from the
+    pyramid level answering BatteryData.query, and its mean line reduced to max_points with LTTB.
+    """
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(12, 5))
+    ts_list = battery.timeseries_data if isinstance(battery.timeseries_data, list) else [battery.timeseries_data]
+    for ts, df in zip(ts_list, battery.query(t0, t1, max_points=4 * max_points)):
+        t, mean = df['Time (s)'].to_numpy(), df['Temp mean (°C)'].to_numpy()
+        keep = lttb(t, mean, max_points)
+        line, = ax.plot(t[keep], mean[keep], label=ts.description or None)
+        if df.attrs['level'] > 0:
+            ax.fill_between(t, df['Temp min (°C)'], df['Temp max (°C)'], color=line.get_color(), alpha=0.2, linewidth=0)
+    ax.set_title(f"{battery.cell_id}")
+    ax.set_xlabel("Time (s)")
+    ax.set_ylabel("Temperature (°C)")
+    if any(ts.description for ts in ts_list):
+        ax.legend()
+    plt.tight_layout()
+    plt.show()
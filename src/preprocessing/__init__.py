@@ -1,6 +1,29 @@
 
-from .preprocess_ORNL import ORNLPreprocessor
-from .preprocess_HealthyArchive import CALCEPreprocessor, HNEIPreprocessor, MichiganPreprocessor, OXPreprocessor, SNLPreprocessor, ULPurduePreprocessor
+import importlib
+
+from src.builders import PREPROCESSORS
+
+# Preprocessors are imported on first use (PREPROCESSORS.build or attribute access)
+# so that importing this package does not pull in pandas/openpyxl.
+_PREPROCESSOR_MODULES = {
+    'ORNLPreprocessor': 'src.preprocessing.preprocess_ORNL',
+    'CALCEPreprocessor': 'src.preprocessing.preprocess_HealthyArchive',
+    'HNEIPreprocessor': 'src.preprocessing.preprocess_HealthyArchive',
+    'MichiganPreprocessor': 'src.preprocessing.preprocess_HealthyArchive',
+    'OXPreprocessor': 'src.preprocessing.preprocess_HealthyArchive',
+    'SNLPreprocessor': 'src.preprocessing.preprocess_HealthyArchive',
+    'ULPurduePreprocessor': 'src.preprocessing.preprocess_HealthyArchive',
+}
+_UNREGISTERED = ['MichiganPreprocessor']
+
+for _name, _module in _PREPROCESSOR_MODULES.items():
+    if _name not in _UNREGISTERED:
+        PREPROCESSORS.register_lazy(_name, f'{_module}:{_name}')
+
+def __getattr__(name):
+    if name in _PREPROCESSOR_MODULES:
+        return getattr(importlib.import_module(_PREPROCESSOR_MODULES[name]), name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 SUPPORTED_SOURCES = {
     'DATASETS': ['CALCE', 'HNEI', 'OX', 'ORNL', 'SNL', 'ULPurdue'],
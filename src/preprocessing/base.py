@@ -9,6 +9,8 @@ from pathlib import Path
 
 from src.config import config
 from src.data.battery_data import BatteryData, TimeseriesData
+from src.data.chunk_store import ChunkStore
+from src.utils.profiler import PROFILER
 
 class BasePreprocessor:
     """
@@ -28,6 +30,9 @@ class BasePreprocessor:
         self.display_name = display_name or name
         self.output_dir = output_dir or f'{config.PROCESSED_DATA_DIR}/'
         self.silent = silent
+        # next to the cells it serves; sources writing to the same output_dir share it, so
+        # identical arrays are stored once corpus-wide
+        self.chunk_store = ChunkStore(Path(self.output_dir) / 'chunks') if config.CHUNKED_STORAGE else None
 
     def process(self, *args, **kwargs) -> List[BatteryData]:
         """Main logic for preprocessing data."""
@@ -46,27 +51,37 @@ class BasePreprocessor:
           
         process_batteries_num = 0
         skip_batteries_num = 0
-        for cell in tqdm(cells, desc=f'Processing {self.display_name} cells'):
-            # judge whether to skip the processed file
-            whether_to_skip = self.check_processed_file(cell)
-            if whether_to_skip == True:
-                skip_batteries_num += 1
-                continue
-
-            # get data from the file
-            try:
-                timeseries_data = self.get_timeseries_data(inputdir=inputdir, cell=cell, *args, **kwargs)
-            except:
-                skip_batteries_num += 1
-                continue
-
-            # store data
-            battery = self.get_cell_info(cell=cell, timeseries_data=timeseries_data, *args, **kwargs)
-            self.dump_single_file(battery)
-            process_batteries_num += 1
-
-            if not self.silent:
-                tqdm.write(f'File: {battery.cell_id} dumped to pkl file')
+        with PROFILER.stage('process_cells', source=self.display_name) as stage:
+            for cell in tqdm(cells, desc=f'Processing {self.display_name} cells'):
+                # judge whether to skip the processed file
+                whether_to_skip = self.check_processed_file(cell)
+                if whether_to_skip == True:
+                    skip_batteries_num += 1
+                    continue
+
+                # get data from the file
+                try:
+                    with PROFILER.stage('get_timeseries_data', cell=cell) as rec:
+                        timeseries_data = self.get_timeseries_data(inputdir=inputdir, cell=cell, *args, **kwargs)
+                        rec['items'] = len(timeseries_data)
+                except:
+                    skip_batteries_num += 1
+                    continue
+
+                if config.BUILD_PYRAMIDS:
+                    with PROFILER.stage('build_pyramid', cell=cell):
+                        for ts in timeseries_data:
+                            ts.build_pyramid()
+
+                # store data
+                battery = self.get_cell_info(cell=cell, timeseries_data=timeseries_data, *args, **kwargs)
+                with PROFILER.stage('dump_single_file', cell=cell):
+                    self.dump_single_file(battery)
+                process_batteries_num += 1
+
+                if not self.silent:
+                    tqdm.write(f'File: {battery.cell_id} dumped to pkl file')
+            stage['items'] = process_batteries_num
 
         return process_batteries_num, skip_batteries_num
     
@@ -82,6 +97,9 @@ class BasePreprocessor:
         if not self.silent:
             print(f'Successfully processed {process_batteries_num} batteries.')
             print(f'Skip processing {skip_batteries_num} batteries.')
+            if self.chunk_store is not None and self.chunk_store.logical_bytes:
+                stats = self.chunk_store.stats()
+                print(f"Deduplicated {stats['saved_bytes'] / 2**20:.1f} of {stats['logical_bytes'] / 2**20:.1f} MiB of timeseries arrays.")
 
     def check_processed_file(self, processed_file: str):
         expected_pkl_path = os.path.join(
@@ -96,7 +114,7 @@ class BasePreprocessor:
         return False
 
     def dump_single_file(self, battery: BatteryData):
-        battery.dump(f'{self.output_dir}/{battery.cell_id}.pkl')
+        battery.dump(f'{self.output_dir}/{battery.cell_id}.pkl', chunk_store=self.chunk_store)
 
     def summary(self, batteries: List[BatteryData]):
         print(f'Successfully processed {len(batteries)} batteries.')
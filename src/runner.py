@@ -1,12 +1,48 @@
+import argparse
+
 from src.preprocessing import SUPPORTED_SOURCES
 from src.builders import PREPROCESSORS
 
-def preprocess(orgs_to_skip=[], silent=False):
+def preprocess(orgs_to_skip=[], silent=False, output_dir=None):
     for org in SUPPORTED_SOURCES['DATASETS']:
         if org not in orgs_to_skip:
             config = {
-                'name': f'{org}Preprocessor'
+                'name': f'{org}Preprocessor',
+                'output_dir': output_dir,
             }
             processor = PREPROCESSORS.build(config)
             pr, sk = processor.process()
-            if not silent: print(f'{pr} processed, {sk} skipped\n')
\ No newline at end of file
+            if not silent: print(f'{pr} processed, {sk} skipped\n')
+    if not silent: print_dedup_report(output_dir)
+
+def print_dedup_report(processed_dir=None):
+    from src.data.chunk_store import dedup_report
+    report = dedup_report(processed_dir)
+    if report['stored_bytes']:
+        print(f"{report['cells']} cells reference {report['referenced_bytes'] / 2**20:.1f} MiB of arrays, "
+              f"{report['stored_bytes'] / 2**20:.1f} MiB stored ({report['dedup_ratio']:.2f}x, "
+              f"{report['saved_bytes'] / 2**20:.1f} MiB saved)")
+
+def experiment(spec_path, silent=False):
+    from src.pipeline import run_experiment
+    return run_experiment(spec_path, silent=silent)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m src.runner')
+    commands = parser.add_subparsers(dest='command', required=True)
+    pre = commands.add_parser('preprocess', help='preprocess the raw datasets')
+    pre.add_argument('--skip', nargs='*', default=[], choices=SUPPORTED_SOURCES['DATASETS'])
+    exp = commands.add_parser('experiment', help='run a YAML experiment spec')
+    exp.add_argument('spec')
+    commands.add_parser('dedup-report', help='bytes saved by the shared chunk store of the preprocessed data')
+    args = parser.parse_args(argv)
+
+    if args.command == 'preprocess':
+        preprocess(orgs_to_skip=args.skip)
+    elif args.command == 'dedup-report':
+        print_dedup_report()
+    else:
+        experiment(args.spec)
+
+if __name__ == '__main__':
+    main()
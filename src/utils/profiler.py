@@ -0,0 +1,171 @@
+"""
+Stage profiler for the preprocessing/training pipeline.
+
+    from src.utils.profiler import PROFILER, profiled
+
+    PROFILER.enable()                      # or set TR_PROFILE=1 before starting python
+    with PROFILER.stage('get_best', model=name) as rec:
+        ...
+        rec['items'] = len(y)
+
+    @profiled('save_all_roc_curves')
+    def save_all_roc_curves(...): ...
+
+    PROFILER.summary()                     # per-stage table
+    PROFILER.export_chrome_trace()         # open in chrome://tracing or ui.perfetto.dev
+
+Each finished stage appends one JSON line (wall/CPU seconds, peak RSS, item count, nesting)
+to the trace file. Enabling sets environment variables, so worker processes started
+afterwards (joblib/loky) profile into the same file. When disabled, a stage costs one
+attribute check.
+"""
+import os
+import sys
+import json
+import time
+import threading
+import functools
+import resource
+
+from src.config import config
+
+ENV_FLAG = 'TR_PROFILE'
+ENV_TRACE = 'TR_PROFILE_TRACE'
+
+def _peak_rss_mb():
+    scale = 1 if sys.platform == 'darwin' else 1024  # ru_maxrss is bytes on macOS, KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+
+class _Sink(dict):
+    """Record handed out while profiling is disabled; writes to it are dropped."""
+    def __setitem__(self, key, value):
+        pass
+
+class _DisabledStage:
+    _sink = _Sink()
+
+    def __enter__(self):
+        return self._sink
+
+    def __exit__(self, *exc):
+        return False
+
+_DISABLED = _DisabledStage()
+
+class _Stage:
+    def __init__(self, profiler, name, meta):
+        self.profiler = profiler
+        self.record = {'name': name, **meta}
+
+    def __enter__(self):
+        stack = self.profiler._stack()
+        self.record['parent'] = stack[-1]['name'] if stack else None
+        self.record['depth'] = len(stack)
+        stack.append(self.record)
+        self.rss_before = _peak_rss_mb()
+        self.start = time.time()
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        return self.record
+
+    def __exit__(self, exc_type, exc, tb):
+        rec = self.record
+        rec['wall_s'] = time.perf_counter() - self.wall
+        rec['cpu_s'] = time.process_time() - self.cpu
+        rec['start_us'] = int(self.start * 1e6)
+        rec['peak_rss_mb'] = _peak_rss_mb()
+        rec['peak_rss_growth_mb'] = rec['peak_rss_mb'] - self.rss_before
+        rec['pid'] = os.getpid()
+        rec['tid'] = threading.get_ident()
+        if exc_type is not None:
+            rec['error'] = exc_type.__name__
+        self.profiler._stack().pop()
+        self.profiler._write(rec)
+        return False
+
+class Profiler:
+    def __init__(self):
+        self.enabled = bool(os.environ.get(ENV_FLAG))
+        self.trace_path = os.environ.get(ENV_TRACE) or os.path.join(config.RESULTS_DIR, 'profile_trace.jsonl')
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def enable(self, trace_path=None, reset=False):
+        self.trace_path = trace_path or self.trace_path
+        os.makedirs(os.path.dirname(self.trace_path) or '.', exist_ok=True)
+        if reset and os.path.exists(self.trace_path):
+            os.remove(self.trace_path)
+        os.environ[ENV_FLAG] = '1'
+        os.environ[ENV_TRACE] = self.trace_path
+        self.enabled = True
+
+    def disable(self):
+        os.environ.pop(ENV_FLAG, None)
+        self.enabled = False
+
+    def stage(self, name, **meta):
+        """Context manager timing one stage; the yielded dict can take 'items' and other fields."""
+        if not self.enabled:
+            return _DISABLED
+        return _Stage(self, name, meta)
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def _write(self, record):
+        line = json.dumps(record, default=str) + '\n'
+        with self._lock, open(self.trace_path, 'a') as f:
+            f.write(line)
+
+    def records(self, path=None):
+        with open(path or self.trace_path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def summary(self, path=None):
+        """DataFrame with one row per stage name: calls, total/mean wall and CPU time, items/s, peak RSS."""
+        import pandas as pd
+
+        df = pd.DataFrame(self.records(path))
+        if 'items' not in df.columns:
+            df['items'] = float('nan')
+        table = df.groupby('name').agg(
+            calls=('wall_s', 'size'),
+            wall_s=('wall_s', 'sum'),
+            mean_wall_s=('wall_s', 'mean'),
+            cpu_s=('cpu_s', 'sum'),
+            items=('items', 'sum'),
+            peak_rss_mb=('peak_rss_mb', 'max'),
+        )
+        table['items_per_s'] = table['items'] / table['wall_s']
+        return table.sort_values('wall_s', ascending=False)
+
+    def export_chrome_trace(self, out=None, path=None):
+        """Write the trace in Chrome trace-event format and return the output path."""
+        events = []
+        for rec in self.records(path):
+            events.append({
+                'name': rec['name'], 'ph': 'X', 'ts': rec['start_us'], 'dur': int(rec['wall_s'] * 1e6),
+                'pid': rec['pid'], 'tid': rec['tid'],
+                'args': {k: v for k, v in rec.items() if k not in ('name', 'start_us', 'wall_s', 'pid', 'tid')},
+            })
+        out = out or os.path.splitext(path or self.trace_path)[0] + '.chrome.json'
+        with open(out, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        return out
+
+PROFILER = Profiler()
+
+def profiled(name=None, **meta):
+    """Decorator form of PROFILER.stage."""
+    def decorator(fn):
+        stage_name = name or fn.__name__
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return fn(*args, **kwargs)
+            with PROFILER.stage(stage_name, **meta):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
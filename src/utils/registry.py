@@ -1,6 +1,8 @@
 # Licensed under the MIT License.
 # Copyright (c) Microsoft Corporation.
 
+import importlib
+
 class Registry:
     """Build a custom class instance using a dict.
 
@@ -29,20 +31,47 @@ class Registry:
 
     mymodel = MODELS.build(config)
     ```
+
+    Or register it lazily, entry-point style, so its module is only imported
+    the first time it is built:
+
+    ```python
+    MODELS.register_lazy('MyModel', 'src.models.my_model:MyModel')
+    ```
     """
     def __init__(self, name: str):
         self.name = name
         self.class_mapping = {}
+        self.lazy_mapping = {}
 
     def register(self, name=None):
         def _register(cls):
             module_name = name or cls.__name__
             if module_name in self.class_mapping:
                 raise ValueError(f'class {module_name} is already registered!')
+            # importing a lazily registered module registers the real class
+            self.lazy_mapping.pop(module_name, None)
             self.class_mapping[module_name] = cls
             return cls
         return _register
 
+    def register_lazy(self, name: str, target: str):
+        """Register `name` as 'module.path:attr', resolved on first use."""
+        if name in self.class_mapping or name in self.lazy_mapping:
+            raise ValueError(f'class {name} is already registered!')
+        self.lazy_mapping[name] = target
+
+    def get(self, name: str):
+        if name not in self.class_mapping and name in self.lazy_mapping:
+            module, _, attr = self.lazy_mapping[name].partition(':')
+            cls = getattr(importlib.import_module(module), attr or name)
+            self.lazy_mapping.pop(name, None)
+            self.class_mapping.setdefault(name, cls)
+        return self.class_mapping.get(name)
+
+    def __contains__(self, name: str):
+        return name in self.class_mapping or name in self.lazy_mapping
+
     def build(self, config: dict, error_handle: str = 'raise', **kwargs):
         if config is None:
             return
@@ -50,8 +79,8 @@ class Registry:
         if name is None:
             return
 
-        if name in self.class_mapping:
-            return self.class_mapping[name](**{
+        if name in self:
+            return self.get(name)(**{
                 k: v for k, v in config.items()
                 if k != 'name' and k not in kwargs
             }, **kwargs)
@@ -0,0 +1,34 @@
+import sys
+import json
+import subprocess
+
+from pathlib import Path
+
+import pytest
+
+# third-party packages the library modules import at module level
+for module in ['numpy', 'pandas', 'sklearn', 'joblib', 'addict', 'tqdm', 'yaml']:
+    pytest.importorskip(module)
+
+ROOT = Path(__file__).resolve().parents[1]
+IMPORT_BUDGET_S = 3.0
+MODULES = ['src.runner', 'src.preprocessing', 'src.plotting', 'src.classifiers.classical', 'src.classifiers.ensemble']
+HEAVY = ['tensorflow', 'matplotlib']
+
+def cold_import():
+    """Import MODULES in a fresh interpreter; returns the seconds taken and the heavy packages loaded."""
+    code = (
+        'import sys, json, time; t = time.perf_counter(); '
+        f'import {", ".join(MODULES)}; '
+        f'print(json.dumps([time.perf_counter() - t, [m for m in {HEAVY!r} if m in sys.modules]]))'
+    )
+    out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def test_import_does_not_load_heavy_packages():
+    _, loaded = cold_import()
+    assert loaded == [], f'importing the library loaded {loaded}'
+
+def test_import_within_budget():
+    seconds, _ = cold_import()
+    assert seconds <= IMPORT_BUDGET_S, f'import took {seconds:.2f}s, budget is {IMPORT_BUDGET_S}s'